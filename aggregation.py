@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from metrics import metrics
+
+# Stats table column -> (post frame column, reduction). A new metric is one more entry.
+STATS = {
+    'Posts in Last 24 Hours': ('score', 'size'),
+    'Total Karma in Last 24 Hours': ('score', 'sum'),
+    'Total Comments in Last 24 Hours': ('num_comments', 'sum'),
+    'SFW Posts': ('sfw', 'sum'),
+    'NSFW Posts': ('over_18', 'sum'),
+    'SFW Comments': ('sfw_comments', 'sum'),
+    'NSFW Comments': ('nsfw_comments', 'sum'),
+}
+# Percentage column -> stats column it is a share of 'Posts in Last 24 Hours' for
+PERCENTAGES = {
+    'SFW Posts %': 'SFW Posts',
+    'NSFW Posts %': 'NSFW Posts',
+}
+STATS_COLUMNS = ['Subreddit', 'Posts in Last 24 Hours', 'Total Karma in Last 24 Hours',
+                 'Total Comments in Last 24 Hours', 'Subscribers', 'SFW Posts', 'NSFW Posts',
+                 'SFW Comments', 'NSFW Comments', 'SFW Posts %', 'NSFW Posts %']
+NUMERIC_FIELDS = ('score', 'num_comments', 'created_utc', 'over_18')
+
+
+def post_frame(posts_by_subreddit):
+    # Every post of every subreddit in one typed frame, subreddit as a categorical
+    subreddits = list(posts_by_subreddit)
+    columns = [posts.to_arrays(NUMERIC_FIELDS) for posts in posts_by_subreddit.values()]
+    lengths = [len(posts) for posts in posts_by_subreddit.values()]
+
+    frame = pd.DataFrame({
+        'subreddit': pd.Categorical.from_codes(np.repeat(np.arange(len(subreddits)), lengths),
+                                               categories=subreddits),
+    })
+    for field in NUMERIC_FIELDS:
+        frame[field] = np.concatenate([column[field] for column in columns]) if columns else np.empty(0)
+    frame['over_18'] = frame['over_18'].astype(np.int64)
+    frame['sfw'] = 1 - frame['over_18']
+    frame['nsfw_comments'] = frame['num_comments'] * frame['over_18']
+    frame['sfw_comments'] = frame['num_comments'] - frame['nsfw_comments']
+    return frame
+
+
+class AggregationResult:
+    # One refresh's numbers: the ranked subreddits, the per-subreddit stats table and
+    # the posts they were computed from
+    __slots__ = ('top_subreddits', 'stats_df', 'posts')
+
+    def __init__(self, top_subreddits, stats_df, posts):
+        self.top_subreddits = top_subreddits
+        self.stats_df = stats_df
+        self.posts = posts
+
+
+@metrics.timed('aggregation')
+def aggregate(top_subreddits, posts_by_subreddit, subscribers):
+    # top_subreddits: [(subreddit, count)] in display order; subscribers: subreddit -> count
+    frame = post_frame(posts_by_subreddit)
+    subreddits = [subreddit for subreddit, _ in top_subreddits]
+
+    stats = frame.groupby('subreddit', observed=False).agg(**STATS)
+    stats = stats.reindex(subreddits, fill_value=0)
+    stats.index = pd.Index(subreddits, name='Subreddit')
+    posts = stats['Posts in Last 24 Hours']
+    for column, count_column in PERCENTAGES.items():
+        stats[column] = (stats[count_column] / posts.where(posts > 0) * 100).fillna(0)
+    stats['Subscribers'] = [subscribers.get(subreddit, 'N/A') for subreddit in subreddits]
+    stats_df = stats.reset_index()[STATS_COLUMNS]
+    return AggregationResult(top_subreddits, stats_df, posts_by_subreddit)
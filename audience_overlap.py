@@ -0,0 +1,122 @@
+import numpy as np
+import plotly.graph_objects as go
+from graph_layout import layout_graph
+from incremental import WINDOW_SECONDS
+from minhash import MinHash, similarity_matrix
+from network_traces import edge_traces, node_positions, scatter_class
+
+AUDIENCE_BUCKET_SECONDS = 60 * 60  # Author signatures kept per hour, so old hours can be dropped
+MIN_OVERLAP = 0.1  # Estimated author Jaccard from which two subreddits are linked in the graph
+
+
+class AudienceIndex:
+    # MinHash signatures of the authors posting in each tracked subreddit over the window.
+    # Each refresh only hashes posts it has not seen; signatures are kept per time bucket
+    # because MinHash cannot forget an author, and expired buckets are dropped instead.
+    def __init__(self, window=WINDOW_SECONDS, bucket_seconds=AUDIENCE_BUCKET_SECONDS):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self._buckets = {}  # subreddit -> bucket start -> MinHash
+        self._seen = {}  # subreddit -> post id -> bucket start
+
+    def update(self, posts_by_subreddit, now):
+        # Signature buckets and seen post ids are kept only for the subreddits passed in
+        self._buckets = {subreddit: self._buckets.get(subreddit, {}) for subreddit in posts_by_subreddit}
+        self._seen = {subreddit: self._seen.get(subreddit, {}) for subreddit in posts_by_subreddit}
+        cutoff = (now - self.window) // self.bucket_seconds * self.bucket_seconds
+
+        for subreddit, posts in posts_by_subreddit.items():
+            buckets, seen = self._buckets[subreddit], self._seen[subreddit]
+            new_authors = {}
+            for post_id, author, created in zip(posts.ids, posts.authors, posts.created_utc):
+                if post_id in seen:
+                    continue
+                start = created // self.bucket_seconds * self.bucket_seconds
+                if start < cutoff:
+                    continue
+                seen[post_id] = start
+                if author is not None:
+                    new_authors.setdefault(start, []).append(author)
+            for start, authors in new_authors.items():
+                buckets.setdefault(start, MinHash()).update(authors)
+
+            expired = {start for start in buckets if start < cutoff}
+            for start in expired:
+                del buckets[start]
+            if expired:
+                self._seen[subreddit] = {post_id: start for post_id, start in seen.items() if start >= cutoff}
+
+    def signatures(self):
+        return {subreddit: MinHash.merged(buckets.values()) for subreddit, buckets in self._buckets.items()}
+
+
+def create_audience_overlap_figures(signatures, subreddits, min_overlap=MIN_OVERLAP, layout_cache=None):
+    # Heatmap of estimated author overlap between every pair of subreddits, in the given
+    # order, and a network of every pair at or above min_overlap
+    import networkx as nx
+    subreddits = [subreddit for subreddit in subreddits
+                  if subreddit in signatures and not signatures[subreddit].empty]
+    if len(subreddits) < 2:
+        print("Not enough subreddits with known authors to compare.")
+        return go.Figure(), go.Figure()
+    ordered = [signatures[subreddit] for subreddit in subreddits]
+    similarity = similarity_matrix(ordered)
+
+    heatmap = go.Figure(go.Heatmap(
+        z=np.round(similarity, 3),
+        x=subreddits,
+        y=subreddits,
+        colorscale='YlGnBu',
+        zmin=0,
+        zmax=max(float(similarity[~np.eye(len(subreddits), dtype=bool)].max()), min_overlap),
+        colorbar=dict(title='Author Jaccard'),
+        hovertemplate='%{y} and %{x}: %{z:.0%} shared authors<extra></extra>'))
+    heatmap.update_layout(title='Audience Overlap Between Subreddits (estimated)',
+                          xaxis=dict(tickangle=45, showgrid=False),
+                          yaxis=dict(autorange='reversed', showgrid=False),
+                          height=600)
+
+    # The full matrix is already computed for the heatmap, so no pair can be missed
+    G = nx.Graph()
+    for i, j in zip(*np.nonzero(np.triu(similarity >= min_overlap, k=1))):
+        G.add_edge(subreddits[i], subreddits[j], weight=float(similarity[i, j]))
+    if G.number_of_edges() == 0:
+        print(f"No subreddits share more than {min_overlap:.0%} of their authors.")
+        return heatmap, go.Figure()
+
+    pos = layout_graph(G, layout_cache, ('audience', ''))
+    scatter = scatter_class(len(G) + G.number_of_edges())
+    edges = list(G.edges(data='weight'))
+    edge_trace = edge_traces([(source, target) for source, target, _ in edges], pos,
+                             [1 + weight * 10 for _, _, weight in edges], scatter=scatter,
+                             hover_texts=[f'{source} + {target}: {weight:.0%} shared authors'
+                                          for source, target, weight in edges])
+
+    nodes = list(G.nodes())
+    node_xy = node_positions(nodes, pos)
+    degrees = [G.degree(node) for node in nodes]
+    node_trace = scatter(
+        x=node_xy[:, 0],
+        y=node_xy[:, 1],
+        text=nodes,
+        mode='markers+text',
+        hoverinfo='text',
+        hovertext=[f'{node} (overlaps with {degree} subreddits)' for node, degree in zip(nodes, degrees)],
+        marker=dict(
+            showscale=True,
+            colorscale='YlGnBu',
+            size=[10 + degree * 2 for degree in degrees],
+            color=degrees,
+            colorbar=dict(thickness=15, title='Overlapping Subreddits', xanchor='left', titleside='right'),
+            line_width=2))
+
+    graph = go.Figure(data=edge_trace + [node_trace],
+                      layout=go.Layout(
+                          title=f'Subreddits Sharing at Least {min_overlap:.0%} of Their Authors',
+                          showlegend=False,
+                          hovermode='closest',
+                          margin=dict(b=20, l=5, r=5, t=40),
+                          height=600,
+                          xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                          yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)))
+    return heatmap, graph
@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# The dashboard module reads these at import time: generated data, and SQLite files
+# somewhere that is thrown away afterwards. Nothing here touches the network.
+os.environ['REDDSCAN_DATA_SOURCE'] = 'synthetic'
+os.environ.setdefault('REDDSCAN_DATA_DIR', tempfile.mkdtemp(prefix='reddscan-bench-'))
+
+import redditorial
+from aggregation import aggregate
+from audience_overlap import AudienceIndex, create_audience_overlap_figures
+from comments import CommentSampler
+from data_sources import SyntheticSource
+from fetcher import SubredditFetcher
+from graph_layout import LayoutCache
+from incremental import IncrementalIngestor
+from rate_limiter import RateLimiter
+from snapshot import Snapshot
+
+DEFAULT_SIZES = '10x500,30x2000,100x5000'  # subreddits x posts per subreddit
+DEFAULT_SAMPLED_SUBREDDITS = 3  # Subreddits every figure builder and callback is timed on
+DEFAULT_REPEAT = 3  # Best of this many runs is reported
+DEFAULT_TOLERANCE = 0.25  # Slower than the baseline by more than this fraction is a regression
+MIN_REGRESSION_SECONDS = 0.01  # Ignore differences this small, they are timer noise
+
+
+class FixedScheduler:
+    # Stands in for the SnapshotScheduler so callbacks serve the benchmark's snapshot
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def current(self):
+        return self.snapshot
+
+    def start(self):
+        pass
+
+
+def parse_sizes(text):
+    sizes = []
+    for size in text.split(','):
+        num_subreddits, posts_per_subreddit = size.lower().split('x')
+        sizes.append((int(num_subreddits), int(posts_per_subreddit)))
+    return sizes
+
+
+def best_of(repeat, func):
+    # Fastest run and its result; every run starts from the same state
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def callback_payload(output_ids, input_id, input_property, value):
+    outputs = [{'id': output_id, 'property': 'figure'} for output_id in output_ids]
+    return {
+        'output': '..' + '...'.join(f'{output_id}.figure' for output_id in output_ids) + '..'
+                  if len(output_ids) > 1 else f'{output_ids[0]}.figure',
+        'outputs': outputs if len(outputs) > 1 else outputs[0],
+        'inputs': [{'id': input_id, 'property': input_property, 'value': value}],
+        'changedPropIds': [f'{input_id}.{input_property}'],
+        'state': [],
+    }
+
+
+def round_trip(client, payload):
+    response = client.post('/_dash-update-component', json=payload)
+    if response.status_code != 200:
+        raise RuntimeError(f"Callback returned HTTP {response.status_code}")
+    return response
+
+
+def fetch_bundle(client, version, subreddit, etag=None):
+    headers = {'Accept-Encoding': 'gzip'}
+    if etag is not None:
+        headers['If-None-Match'] = f'"{etag}"'
+    response = client.get(f'/figures/{version}/{subreddit}', headers=headers)
+    if response.status_code not in (200, 304):
+        raise RuntimeError(f"Figure bundle returned HTTP {response.status_code}")
+    return response
+
+
+def run_size(num_subreddits, posts_per_subreddit, sampled_subreddits, repeat):
+    timings = {}
+    source = SyntheticSource(num_subreddits=num_subreddits, posts_per_subreddit=posts_per_subreddit)
+    fetcher = SubredditFetcher(source, RateLimiter(rate=1e9, burst=1e9), listing_limit=posts_per_subreddit)
+    redditorial.fetcher = fetcher
+    redditorial.SEARCH_X_SUBREDDITS = num_subreddits
+    # Every run writes its stats, as a crawl-mode refresh would
+    redditorial.history_store.min_interval = 0
+
+    def full_ingestion():
+        redditorial.ingestor = IncrementalIngestor(fetcher)
+        return incremental_ingestion()
+
+    def incremental_ingestion():
+        redditorial.subreddit_ranking['top'] = None
+        return redditorial.get_reddit_data()
+
+    timings['ingestion_full'], result = best_of(repeat, full_ingestion)
+    timings['ingestion_incremental'], result = best_of(repeat, incremental_ingestion)
+
+    posts, stats_df = result.posts, result.stats_df
+    subscribers = dict(zip(stats_df['Subreddit'], stats_df['Subscribers']))
+    timings['aggregation'], _ = best_of(repeat, lambda: aggregate(result.top_subreddits, posts, subscribers))
+    timings['history_write'], _ = best_of(repeat, lambda: redditorial.save_snapshot_stats(stats_df))
+    timings['main_graph'], main_figure = best_of(repeat, lambda: redditorial.create_main_graph(stats_df))
+
+    def audience_overlap():
+        # From scratch: every post's author is hashed, as on the first refresh
+        index = AudienceIndex()
+        index.update(posts, time.time())
+        return create_audience_overlap_figures(index.signatures(), list(stats_df['Subreddit']))
+    timings['audience_overlap'], _ = best_of(repeat, audience_overlap)
+
+    sampled = list(stats_df.nlargest(sampled_subreddits, 'Total Karma in Last 24 Hours')['Subreddit'])
+    timings['text_index'], text_indexes = best_of(repeat, lambda: {
+        subreddit: redditorial.make_text_index(posts[subreddit]) for subreddit in sampled})
+
+    comment_sampler = CommentSampler(fetcher, redditorial.get_stop_words)
+    timings['comment_ingestion'], comment_indexes = best_of(repeat, lambda: comment_sampler.sample(
+        {subreddit: posts[subreddit] for subreddit in sampled}))
+
+    for kind, build in redditorial.comment_figure_builders.items():
+        def build_all():
+            redditorial.layout_cache = LayoutCache()
+            for subreddit in sampled:
+                build(subreddit, comment_indexes[subreddit])
+        timings[f'builder_{kind}'], _ = best_of(repeat, build_all)
+
+    for kind, build in redditorial.figure_builders.items():
+        def build_all():
+            # A fresh layout cache each run, so graph layouts are timed cold
+            redditorial.layout_cache = LayoutCache()
+            for subreddit in sampled:
+                build(subreddit, posts[subreddit], text_indexes[subreddit])
+        timings[f'builder_{kind}'], _ = best_of(repeat, build_all)
+
+    # Round trips through the Flask test client, like a browser hovering a bar
+    client = redditorial.server.test_client()
+    versions = itertools.count(1)
+
+    def publish_snapshot():
+        snapshot = Snapshot(next(versions), stats_df, main_figure, redditorial.figure_cache,
+                            posts=posts, text_indexes=text_indexes)
+        snapshot.save()
+        redditorial.snapshot_scheduler = FixedScheduler(snapshot)
+        redditorial.layout_cache = redditorial.figure_precomputer.layout_cache = LayoutCache()
+        return snapshot
+
+    def cold_hovers():
+        version = publish_snapshot().version
+        for subreddit in sampled:
+            fetch_bundle(client, version, subreddit)
+
+    # Every sampled subreddit's figures in the process pool, as a refresh does after publishing
+    def precompute():
+        redditorial.figure_precomputer.precompute(publish_snapshot(), sampled)
+
+    timings['precompute'], _ = best_of(repeat, precompute)
+    timings['figure_bundle_cold'], _ = best_of(repeat, cold_hovers)
+    version = redditorial.snapshot_scheduler.current().version
+    timings['figure_bundle_warm'], _ = best_of(repeat, lambda: [
+        fetch_bundle(client, version, subreddit) for subreddit in sampled])
+    # A browser that already has the bundle only revalidates it
+    timings['figure_bundle_not_modified'], _ = best_of(repeat, lambda: [
+        fetch_bundle(client, version, subreddit, etag=f'{version}-{subreddit}') for subreddit in sampled])
+    main_graph_payload = callback_payload(['main-graph'], 'snapshot-poll', 'n_intervals', 1)
+    main_graph_payload['outputs'] = [{'id': 'main-graph', 'property': 'figure'},
+                                     {'id': 'snapshot-version', 'property': 'data'}]
+    main_graph_payload['output'] = '..main-graph.figure...snapshot-version.data..'
+    main_graph_payload['state'] = [{'id': 'snapshot-version', 'property': 'data', 'value': None}]
+    timings['callback_update_main_graph'], _ = best_of(repeat, lambda: round_trip(client, main_graph_payload))
+
+    return timings
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, timings in results.items():
+        for stage, seconds in timings.items():
+            previous = baseline.get(size, {}).get(stage)
+            if previous is None:
+                continue
+            if seconds > previous * (1 + tolerance) and seconds - previous > MIN_REGRESSION_SECONDS:
+                regressions.append((size, stage, previous, seconds))
+    return regressions
+
+
+def print_report(results, baseline):
+    for size, timings in results.items():
+        print(f"\n{size} (subreddits x posts)")
+        for stage, seconds in timings.items():
+            previous = baseline.get(size, {}).get(stage)
+            change = f"  {(seconds / previous - 1) * 100:+6.1f}%" if previous else ''
+            print(f"  {stage:<32} {seconds * 1000:10.1f} ms{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the dashboard pipeline on generated data, offline.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma separated SUBREDDITSxPOSTS, e.g. 100x5000')
+    parser.add_argument('--sampled-subreddits', type=int, default=DEFAULT_SAMPLED_SUBREDDITS)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--output', help='write the timings to this JSON file')
+    parser.add_argument('--baseline', help='JSON file from an earlier --output run to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = {}
+    for num_subreddits, posts_per_subreddit in parse_sizes(args.sizes):
+        size = f'{num_subreddits}x{posts_per_subreddit}'
+        print(f"Benchmarking {size}...", file=sys.stderr)
+        # The pipeline logs every subreddit it touches; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[size] = run_size(num_subreddits, posts_per_subreddit, args.sampled_subreddits, args.repeat)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'created': time.time(), 'results': results}, file, indent=1)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for size, stage, previous, seconds in regressions:
+        print(f"REGRESSION {size} {stage}: {previous * 1000:.1f} ms -> {seconds * 1000:.1f} ms")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
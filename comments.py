@@ -0,0 +1,88 @@
+import time
+import traceback
+from concurrent.futures import as_completed, TimeoutError
+from itertools import zip_longest
+import numpy as np
+from metrics import metrics
+
+COMMENT_REQUESTS_PER_SUBREDDIT = 10  # API budget per subreddit and refresh
+REPLACE_MORE_LIMIT = 1  # "Load more comments" expansions per thread, one request each
+COMMENTS_PER_THREAD = 200  # Comments read per thread, best first
+COMMENT_TIME_BUDGET_SECONDS = 15  # Per subreddit and refresh, from its first request; later threads are skipped
+
+
+class CommentSampler:
+    # Reads the comments of each subreddit's highest-scoring threads within an explicit
+    # budget per subreddit: requests_per_subreddit API requests (one per thread plus one per
+    # replace_more expansion) and time_budget seconds from its first request, so a slow
+    # subreddit cannot use up the others' time. Threads are fetched concurrently on the
+    # fetcher's pool, every subreddit's best thread before anyone's second, and each
+    # comment is tokenized as its thread arrives and then dropped.
+    def __init__(self, fetcher, load_stop_words, requests_per_subreddit=COMMENT_REQUESTS_PER_SUBREDDIT,
+                 replace_more_limit=REPLACE_MORE_LIMIT, comments_per_thread=COMMENTS_PER_THREAD,
+                 time_budget=COMMENT_TIME_BUDGET_SECONDS):
+        self.fetcher = fetcher
+        self.load_stop_words = load_stop_words  # Called on every sample
+        self.requests_per_subreddit = requests_per_subreddit
+        self.replace_more_limit = replace_more_limit
+        self.comments_per_thread = comments_per_thread
+        self.time_budget = time_budget
+
+    @property
+    def threads_per_subreddit(self):
+        return self.requests_per_subreddit // (1 + self.replace_more_limit)
+
+    def threads(self, posts):
+        # Ids of the highest-scoring posts that have comments at all
+        scores = np.asarray(posts.scores)
+        commented = np.flatnonzero(np.asarray(posts.num_comments) > 0)
+        best = commented[np.argsort(-scores[commented], kind='stable')][:self.threads_per_subreddit]
+        return [posts.ids[row] for row in best]
+
+    @metrics.timed('comment_ingestion')
+    def sample(self, posts_by_subreddit):
+        # subreddit -> TextIndex with one document per comment
+        from text_index import TextIndexBuilder
+        stop_words = self.load_stop_words()
+        builders = {subreddit: TextIndexBuilder(stop_words) for subreddit in posts_by_subreddit}
+        per_subreddit = [[(subreddit, post_id) for post_id in self.threads(posts)]
+                         for subreddit, posts in posts_by_subreddit.items()]
+        jobs = [job for jobs in zip_longest(*per_subreddit) for job in jobs if job is not None]
+
+        deadlines = {}  # subreddit -> monotonic deadline, set by its first request
+
+        def fetch(job):
+            # Threads of a subreddit still queued at its deadline are skipped without a request
+            deadline = deadlines.setdefault(job[0], time.monotonic() + self.time_budget)
+            if time.monotonic() >= deadline:
+                return None
+            return self.fetcher.fetch_comments(job[1], self.comments_per_thread, self.replace_more_limit)
+
+        # Every subreddit's budget back to back bounds the wait even if a request hangs
+        total_budget = self.time_budget * len(per_subreddit)
+        futures = {self.fetcher.submit(fetch, job): job for job in jobs}
+        try:
+            for future in as_completed(futures, timeout=total_budget):
+                subreddit, post_id = futures[future]
+                try:
+                    bodies = future.result()
+                except Exception:
+                    print(f"Fetching comments of {post_id} in {subreddit} failed")
+                    traceback.print_exc()
+                    metrics.increment('comment_threads', result='failed')
+                    continue
+                if bodies is None:
+                    metrics.increment('comment_threads', result='skipped')
+                    continue
+                builder = builders[subreddit]
+                for body in bodies:
+                    builder.add(body)
+                metrics.increment('comment_threads', result='read')
+                metrics.increment('comments', len(bodies))
+        except TimeoutError:
+            print(f"Comment ingestion stopped after {total_budget}s")
+        finally:
+            # Requests already in flight finish in the background and are ignored
+            for future in futures:
+                future.cancel()
+        return {subreddit: builder.build() for subreddit, builder in builders.items()}
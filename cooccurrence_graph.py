@@ -1,27 +1,60 @@
-
+import numpy as np
 import networkx as nx
 import plotly.graph_objects as go
-from collections import defaultdict, Counter
+from plotly.colors import qualitative
+from scipy import sparse
+from graph_layout import graph_communities, layout_graph
+from network_traces import edge_traces, node_positions, scale_to_range, scatter_class
 
-def create_cooccurrence_graph(subreddit, top_titles, custom_stop_words):
-    # Extracting words and tracking co-occurrences
-    cooccurrence_dict = defaultdict(Counter)
-    titles = [submission.title for submission in top_titles]
-    
-    for title in titles:
-        words = [word for word in title.lower().split() if word not in custom_stop_words and word.isalpha()]
-        for i in range(len(words)):
-            for j in range(i + 1, len(words)):
-                cooccurrence_dict[words[i]][words[j]] += 1
-                cooccurrence_dict[words[j]][words[i]] += 1
+MIN_COUNT = 2  # Only consider connections that occur more than once
+TOP_K_EDGES = 500  # Strongest edges kept for the network
+WINDOW = None  # Co-occurrence window in words; None uses the whole title
+COMMUNITY_COLORS = qualitative.Plotly  # One colour per community, largest communities first
+OTHER_COMMUNITY_COLOR = '#bbbbbb'  # Communities beyond the palette
+EDGE_WIDTH_RANGE = (0.5, 6)  # px, weakest to strongest edge shown
+NODE_SIZE_RANGE = (8, 40)  # px, least to most connected word shown
+
+def cooccurrence_edges(text_index, window=WINDOW, min_count=MIN_COUNT, top_k=TOP_K_EDGES):
+    # Returns (sources, targets, weights) indexing text_index.terms
+    num_terms = text_index.num_terms
+    flat, doc_of = text_index.tokens, text_index.doc_of
+
+    if window is None:
+        # Whole-title co-occurrence is the document-term product D^T D
+        counts = (text_index.doc_term.T @ text_index.doc_term).tocsr()
+    else:
+        # Pair each token with the ones up to `window` positions after it in the same title
+        sources, targets = [], []
+        for offset in range(1, window + 1):
+            same_doc = doc_of[:-offset] == doc_of[offset:]
+            sources.append(flat[:-offset][same_doc])
+            targets.append(flat[offset:][same_doc])
+        sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int32)
+        targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.int32)
+        counts = sparse.csr_matrix((np.ones(len(sources)), (sources, targets)), shape=(num_terms, num_terms))
+        counts = counts + counts.T
+
+    # Each unordered pair once, without a word pairing with itself
+    counts = sparse.triu(counts, k=1).tocoo()
+    mask = counts.data >= min_count
+    sources, targets, weights = counts.row[mask], counts.col[mask], counts.data[mask].astype(np.int64)
+
+    if top_k is not None and len(weights) > top_k:
+        strongest = np.argpartition(-weights, top_k - 1)[:top_k]
+        sources, targets, weights = sources[strongest], targets[strongest], weights[strongest]
+
+    return sources, targets, weights
+
+def create_cooccurrence_graph(subreddit, text_index, window=WINDOW, min_count=MIN_COUNT, top_k=TOP_K_EDGES,
+                              layout_cache=None, kind='cooccurrence', label='Co-Occurrence'):
+    # kind keys the cached layout and communities; label names the text in the titles
+    # Tracking co-occurrences of the already tokenized titles
+    sources, targets, weights = cooccurrence_edges(text_index, window=window, min_count=min_count, top_k=top_k)
+    terms = text_index.terms
 
     # Building the graph
     G = nx.Graph()
-    
-    for word, connections in cooccurrence_dict.items():
-        for connected_word, count in connections.items():
-            if count > 1:  # Only consider connections that occur more than once
-                G.add_edge(word, connected_word, weight=count)
+    G.add_weighted_edges_from(zip(terms[sources], terms[targets], weights.tolist()))
     
     # Filter nodes to include only those with 2 or more connections
     filtered_nodes = [node for node in G.nodes() if len(list(G.neighbors(node))) >= 2]
@@ -32,52 +65,48 @@ def create_cooccurrence_graph(subreddit, top_titles, custom_stop_words):
         print("No significant nodes with 2 or more connections found.")
         return go.Figure()
     
-    # Using community detection (optional)
-    communities = nx.algorithms.community.greedy_modularity_communities(G)
-    
-    pos = nx.spring_layout(G, k=0.5)
+    # Word clusters, kept with the layout so they are only recomputed when the graph changes
+    communities = graph_communities(G, layout_cache, (kind, subreddit))
+
+    pos = layout_graph(G, layout_cache, (kind, subreddit), k=0.5)
     
-    edge_trace = []
-    for edge in G.edges(data=True):
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_trace.append(go.Scatter(
-            x=[x0, x1, None],
-            y=[y0, y1, None],
-            line=dict(width=edge[2]['weight'], color='#888'),
-            hoverinfo='text',
-            text=f'{edge[0]} + {edge[1]}: {edge[2]["weight"]} co-occurrences',
-            mode='lines'))
+    # Widths are scaled into EDGE_WIDTH_RANGE; the hover text keeps the raw counts
+    scatter = scatter_class(len(G.nodes()) + G.number_of_edges())
+    edges = list(G.edges(data='weight'))
+    edge_trace = edge_traces([(source, target) for source, target, _ in edges], pos,
+                             scale_to_range([weight for _, _, weight in edges], *EDGE_WIDTH_RANGE), scatter=scatter,
+                             hover_texts=[f'{source} + {target}: {weight} co-occurrences'
+                                          for source, target, weight in edges])
 
-    node_trace = go.Scatter(
-        x=[pos[k][0] for k in G.nodes()],
-        y=[pos[k][1] for k in G.nodes()],
-        text=[f'{node}' for node in G.nodes()],  # Only the word itself
+    nodes = list(G.nodes())
+    node_xy = node_positions(nodes, pos)
+    degrees = [G.degree(node) for node in nodes]
+    node_communities = [communities[node] for node in nodes]
+    node_trace = scatter(
+        x=node_xy[:, 0],
+        y=node_xy[:, 1],
+        text=[f'{node}' for node in nodes],  # Only the word itself
         mode='markers+text',
         hoverinfo='text',
-        hovertext=[f'{node} ({len(list(G.neighbors(node)))} connections)' for node in G.nodes()],  # Tooltip with connections
+        # Tooltip with connections and cluster
+        hovertext=[f'{node} ({degree} connections, cluster {community + 1})'
+                   for node, degree, community in zip(nodes, degrees, node_communities)],
+        customdata=node_communities,
         marker=dict(
-            showscale=True,
-            colorscale='YlGnBu',
-            size=[len(list(G.neighbors(node))) * 5 for node in G.nodes()],
-            color=[len(list(G.neighbors(node))) for node in G.nodes()],
-            colorbar=dict(
-                thickness=15,
-                title='Node Connections',
-                xanchor='left',
-                titleside='right'
-            ),
+            size=scale_to_range(degrees, *NODE_SIZE_RANGE),
+            color=[COMMUNITY_COLORS[community] if community < len(COMMUNITY_COLORS) else OTHER_COMMUNITY_COLOR
+                   for community in node_communities],
             line_width=2))
     
     fig = go.Figure(data=edge_trace + [node_trace],
                     layout=go.Layout(
-                        title=f'Co-Occurrence Network for {subreddit}',
+                        title=f'{label} Network for {subreddit}',
                         titlefont_size=16,
                         showlegend=False,
                         hovermode='closest',
                         margin=dict(b=20, l=5, r=5, t=40),
                         annotations=[dict(
-                            text=f'{subreddit} Co-Occurrence Network',
+                            text=f'{subreddit} {label} Network',
                             showarrow=False,
                             xref="paper", yref="paper",
                             x=0.005, y=-0.002 )],
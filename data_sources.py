@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from bisect import bisect
+from itertools import accumulate, islice
+
+# Every source returns posts as plain dicts: the PostRecord fields plus
+# 'subreddit' and 'subreddit_subscribers'.
+
+
+def submission_to_dict(submission):
+    # Read from the already loaded data so PRAW never lazily fetches anything
+    data = vars(submission)
+    author = data.get('author')
+    subreddit = data.get('subreddit')
+    return {
+        'id': data['id'],
+        'author': author.name if author is not None else None,
+        'score': data['score'],
+        'num_comments': data['num_comments'],
+        'created_utc': data['created_utc'],
+        'over_18': data['over_18'],
+        'title': data['title'],
+        'url': data['url'],
+        'subreddit': subreddit.display_name if subreddit is not None else None,
+        'subreddit_subscribers': data.get('subreddit_subscribers'),
+    }
+
+
+class PrawSource:
+    # Live Reddit. PRAW clients are not thread-safe, so every thread gets its own client.
+    def __init__(self, make_reddit):
+        self.make_reddit = make_reddit
+        self._local = threading.local()
+
+    def _reddit(self):
+        reddit = getattr(self._local, 'reddit', None)
+        if reddit is None:
+            reddit = self._local.reddit = self.make_reddit()
+        return reddit
+
+    def top(self, subreddit, limit, after=None):
+        listing = self._reddit().subreddit(subreddit).top(time_filter='day', limit=limit, params={'after': after})
+        return [submission_to_dict(submission) for submission in listing]
+
+    def new(self, subreddit, limit, after=None):
+        listing = self._reddit().subreddit(subreddit).new(limit=limit, params={'after': after})
+        return [submission_to_dict(submission) for submission in listing]
+
+    def info(self, post_ids):
+        fullnames = ['t3_' + post_id for post_id in post_ids]
+        return [submission_to_dict(submission) for submission in self._reddit().info(fullnames=fullnames)]
+
+    def subscribers(self, subreddit):
+        return self._reddit().subreddit(subreddit).subscribers
+
+    def comments(self, post_id, limit, replace_more_limit):
+        # Bodies of a thread's best comments, breadth first. Fetching the thread is one
+        # request and each replace_more expansion one more; the PRAW objects are dropped here.
+        submission = self._reddit().submission(id=post_id)
+        submission.comment_sort = 'top'
+        submission.comment_limit = limit
+        submission.comments.replace_more(limit=replace_more_limit)
+        return [comment.body for comment in islice(submission.comments.list(), limit)]
+
+    def stream(self, subreddits):
+        # New posts as they are submitted; None whenever a poll comes back empty.
+        # PRAW polls /new itself and backs off while nothing is posted.
+        name = '+'.join(subreddits) if subreddits else 'all'
+        for submission in self._reddit().subreddit(name).stream.submissions(skip_existing=True, pause_after=0):
+            yield None if submission is None else submission_to_dict(submission)
+
+    def limits(self):
+        return self._reddit().auth.limits
+
+
+def synthetic_word(index):
+    # Letters only, so the tokenizer keeps every synthetic word intact
+    letters = ''
+    while True:
+        index, remainder = divmod(index, 26)
+        letters += chr(ord('a') + remainder)
+        if index == 0:
+            return 'w' + letters
+
+
+def _request_path(directory, endpoint, *args):
+    digest = hashlib.sha1(json.dumps(args).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, endpoint, f'{digest}.json')
+
+
+class RecordingSource:
+    # Passes every call through to another source and saves the response to disk
+    def __init__(self, source, directory):
+        self.source = source
+        self.directory = directory
+
+    def _record(self, endpoint, args, response):
+        path = _request_path(self.directory, endpoint, *args)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump({'args': list(args), 'response': response}, file)
+        os.replace(temporary_path, path)
+        return response
+
+    def top(self, subreddit, limit, after=None):
+        return self._record('top', (subreddit, limit, after), self.source.top(subreddit, limit, after))
+
+    def new(self, subreddit, limit, after=None):
+        return self._record('new', (subreddit, limit, after), self.source.new(subreddit, limit, after))
+
+    def info(self, post_ids):
+        return self._record('info', (sorted(post_ids),), self.source.info(post_ids))
+
+    def subscribers(self, subreddit):
+        return self._record('subscribers', (subreddit,), self.source.subscribers(subreddit))
+
+    def comments(self, post_id, limit, replace_more_limit):
+        return self._record('comments', (post_id, limit, replace_more_limit),
+                            self.source.comments(post_id, limit, replace_more_limit))
+
+    def stream(self, subreddits):
+        # Streamed posts are recorded as info() responses, so a replay can answer for them
+        for post in self.source.stream(subreddits):
+            if post is not None:
+                self._record('info', ([post['id']],), [post])
+            yield post
+
+    def limits(self):
+        return self.source.limits()
+
+
+class ReplaySource:
+    # Serves a RecordingSource directory without touching the network. Calls that were
+    # never recorded return empty listings; info() answers from every recorded post.
+    def __init__(self, directory):
+        self.directory = directory
+        self._posts = {}
+        for endpoint in ('top', 'new', 'info'):
+            endpoint_directory = os.path.join(directory, endpoint)
+            if not os.path.isdir(endpoint_directory):
+                continue
+            for name in os.listdir(endpoint_directory):
+                with open(os.path.join(endpoint_directory, name)) as file:
+                    for post in json.load(file)['response']:
+                        self._posts[post['id']] = post
+
+    def _load(self, endpoint, *args, default=None):
+        path = _request_path(self.directory, endpoint, *args)
+        if not os.path.exists(path):
+            return default
+        with open(path) as file:
+            return json.load(file)['response']
+
+    def top(self, subreddit, limit, after=None):
+        return self._load('top', subreddit, limit, after, default=[])
+
+    def new(self, subreddit, limit, after=None):
+        return self._load('new', subreddit, limit, after, default=[])
+
+    def info(self, post_ids):
+        return [self._posts[post_id] for post_id in post_ids if post_id in self._posts]
+
+    def subscribers(self, subreddit):
+        return self._load('subscribers', subreddit)
+
+    def comments(self, post_id, limit, replace_more_limit):
+        return self._load('comments', post_id, limit, replace_more_limit, default=[])
+
+    def stream(self, subreddits):
+        # A recording has no notion of time, so nothing new ever arrives
+        return iter(())
+
+    def limits(self):
+        return None
+
+
+class SyntheticSource:
+    # Deterministic fake Reddit of any size. Post j of subreddit i is generated from a seed
+    # derived from (seed, i, j), so any page can be produced without holding the whole set.
+    def __init__(self, num_subreddits=100, posts_per_subreddit=5000, seed=0,
+                 vocabulary_size=5000, authors_per_subreddit=500, now=None, posts_per_second=1.0):
+        self.num_subreddits = num_subreddits
+        self.posts_per_second = posts_per_second  # Rate of new posts in stream()
+        self.posts_per_subreddit = posts_per_subreddit
+        self.seed = seed
+        self.authors_per_subreddit = authors_per_subreddit
+        self.now = now or time.time()
+        self.vocabulary = [synthetic_word(i) for i in range(vocabulary_size)]
+        # Zipf-like word frequencies, like real titles
+        self._word_weights = list(accumulate(1.0 / (rank + 1) for rank in range(vocabulary_size)))
+        self._subreddit_weights = list(accumulate(1.0 / (rank + 1) for rank in range(num_subreddits)))
+
+    def subreddit_name(self, index):
+        return f'synthetic_{index:03d}'
+
+    def _subreddit_index(self, subreddit):
+        return int(subreddit.rsplit('_', 1)[1])
+
+    def post(self, subreddit_index, rank):
+        rng = random.Random(f'{self.seed}:{subreddit_index}:{rank}')
+        words = [self.vocabulary[bisect(self._word_weights, rng.random() * self._word_weights[-1])]
+                 for _ in range(rng.randint(4, 14))]
+        post_id = f's{subreddit_index}p{rank}'
+        return {
+            'id': post_id,
+            'author': f'user{int(rng.paretovariate(1.2)) % self.authors_per_subreddit}' if rng.random() > 0.03 else None,
+            # Listings are ordered by score, so the score falls with rank
+            'score': int(50000 / (rank + 1) ** 0.8) + rng.randint(0, 20),
+            'num_comments': rng.randint(0, 2000) // (rank // 50 + 1),
+            'created_utc': self.now - rng.uniform(0, 24 * 60 * 60),
+            'over_18': rng.random() < 0.05,
+            'title': ' '.join(words),
+            'url': f'https://www.reddit.com/r/{self.subreddit_name(subreddit_index)}/comments/{post_id}',
+            'subreddit': self.subreddit_name(subreddit_index),
+            'subreddit_subscribers': self.subscribers(self.subreddit_name(subreddit_index)),
+        }
+
+    def _all_post(self, rank):
+        # r/all mixes subreddits, weighted towards the first ones
+        rng = random.Random(f'{self.seed}:all:{rank}')
+        subreddit_index = bisect(self._subreddit_weights, rng.random() * self._subreddit_weights[-1])
+        return self.post(subreddit_index, rank)
+
+    def posts(self, subreddit):
+        index = self._subreddit_index(subreddit)
+        return (self.post(index, rank) for rank in range(self.posts_per_subreddit))
+
+    def _page(self, make_post, total, limit, after):
+        start = int(after.rsplit('p', 1)[1]) + 1 if after else 0
+        return [make_post(rank) for rank in range(start, min(start + limit, total))]
+
+    def top(self, subreddit, limit, after=None):
+        if subreddit == 'all':
+            return self._page(self._all_post, self.num_subreddits * self.posts_per_subreddit, limit, after)
+        index = self._subreddit_index(subreddit)
+        return self._page(lambda rank: self.post(index, rank), self.posts_per_subreddit, limit, after)
+
+    def new(self, subreddit, limit, after=None):
+        # Posts only appear through stream()
+        return []
+
+    def stream(self, subreddits):
+        # Generated posts at posts_per_second, ranked after every listed post of their subreddit
+        indexes = [self._subreddit_index(subreddit) for subreddit in subreddits] if subreddits \
+            else list(range(self.num_subreddits))
+        rng = random.Random(f'{self.seed}:stream')
+        next_rank = dict.fromkeys(indexes, self.posts_per_subreddit)
+        while True:
+            time.sleep(rng.expovariate(self.posts_per_second))
+            index = rng.choice(indexes)
+            post = self.post(index, next_rank[index])
+            post['created_utc'] = time.time()
+            next_rank[index] += 1
+            yield post
+
+    def info(self, post_ids):
+        posts = []
+        for post_id in post_ids:
+            subreddit_index, rank = post_id[1:].split('p')
+            posts.append(self.post(int(subreddit_index), int(rank)))
+        return posts
+
+    def subscribers(self, subreddit):
+        return 10000000 // (self._subreddit_index(subreddit) + 1)
+
+    def comments(self, post_id, limit, replace_more_limit):
+        subreddit_index, rank = post_id[1:].split('p')
+        num_comments = self.post(int(subreddit_index), int(rank))['num_comments']
+        rng = random.Random(f'{self.seed}:comments:{post_id}')
+        return [' '.join(self.vocabulary[bisect(self._word_weights, rng.random() * self._word_weights[-1])]
+                         for _ in range(rng.randint(3, 40)))
+                for _ in range(min(num_comments, limit))]
+
+    def limits(self):
+        return None
@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from post_store import PostStore, record_from_dict
+from metrics import metrics
+
+PAGE_SIZE = 100  # Reddit returns at most 100 items per listing request
+MAX_LISTING_SIZE = 1000  # Listings stop paging after roughly 1000 items
+DEFAULT_WORKERS = 8
+
+
+def fullname(post):
+    return 't3_' + post['id']
+
+
+class SubredditFetcher:
+    # Pulls several subreddits at once from a data source (see data_sources.py).
+    # All worker threads share one rate limiter. The threads live as long as the fetcher,
+    # so each keeps its API client, connection and OAuth token from one refresh to the next.
+    def __init__(self, source, rate_limiter, max_workers=DEFAULT_WORKERS, listing_limit=MAX_LISTING_SIZE):
+        self.source = source
+        self.rate_limiter = rate_limiter
+        self.max_workers = max_workers
+        self.listing_limit = listing_limit
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _request(self, endpoint, call, cost=1):
+        # cost: API requests the call may make, all taken from the limiter up front
+        with metrics.timer('rate_limit_wait'):
+            for _ in range(cost):
+                self.rate_limiter.acquire()
+        with metrics.timer('reddit_api', endpoint=endpoint):
+            result = call(self.source)
+        self.rate_limiter.update(self.source.limits())
+        return result
+
+    @metrics.timed('paging', listing='top')
+    def fetch_top(self, subreddit, limit=None):
+        limit = limit or self.listing_limit
+        posts = []
+        after = None
+        while len(posts) < limit:
+            page_size = min(PAGE_SIZE, limit - len(posts))
+            page = self._request('top', lambda source: source.top(subreddit, page_size, after))
+            posts.extend(page)
+
+            if len(page) < page_size:
+                break
+            after = fullname(page[-1])
+        return posts
+
+    @metrics.timed('paging', listing='new')
+    def fetch_new(self, subreddit, since_utc, limit=None):
+        # Pages /new from the newest post back until it reaches the watermark
+        limit = limit or self.listing_limit
+        posts = []
+        subscribers = None
+        after = None
+        while len(posts) < limit:
+            page = self._request('new', lambda source: source.new(subreddit, PAGE_SIZE, after))
+            fresh = [post for post in page if post['created_utc'] > since_utc]
+            posts.extend(fresh)
+            if page and subscribers is None:
+                subscribers = page[0].get('subreddit_subscribers')
+
+            if len(fresh) < len(page) or len(page) < PAGE_SIZE:
+                break
+            after = fullname(page[-1])
+        return [record_from_dict(post) for post in posts], subscribers
+
+    def fetch_info(self, post_ids):
+        # Current score/comment counts, 100 posts per request
+        records = []
+        for start in range(0, len(post_ids), PAGE_SIZE):
+            batch = post_ids[start:start + PAGE_SIZE]
+            page = self._request('info', lambda source: source.info(batch))
+            records.extend(record_from_dict(post) for post in page)
+        return records
+
+    def fetch_comments(self, post_id, limit, replace_more_limit):
+        # The thread itself plus at most replace_more_limit "load more comments" requests
+        return self._request('comments', lambda source: source.comments(post_id, limit, replace_more_limit),
+                             cost=1 + replace_more_limit)
+
+    def stream(self, subreddits):
+        # New posts from the tracked subreddits (all of Reddit when None). The source polls
+        # on its own schedule; the shared limiter still learns the remaining quota from it.
+        for post in self.source.stream(subreddits):
+            self.rate_limiter.update(self.source.limits())
+            if post is not None:
+                metrics.increment('stream_posts')
+            yield post
+
+    def fetch_subscribers(self, subreddit, posts):
+        # Listing data already carries the subscriber count; only ask for it if missing
+        if posts:
+            subscribers = posts[0].get('subreddit_subscribers')
+            if subscribers is not None:
+                return subscribers
+        return self._request('about', lambda source: source.subscribers(subreddit))
+
+    def fetch_subreddit(self, subreddit):
+        print(f"Processing subreddit: {subreddit}")
+        posts = self.fetch_top(subreddit)
+        subscribers = self.fetch_subscribers(subreddit, posts)
+        return subreddit, PostStore.from_dicts(posts), subscribers
+
+    def submit(self, fetch, *args):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='reddit-fetch')
+        return self._executor.submit(fetch, *args)
+
+    def map(self, fetch, items):
+        # Results come back in the order the items were given
+        futures = [self.submit(fetch, item) for item in items]
+        return [future.result() for future in futures]
+
+    def fetch_subreddits(self, subreddits):
+        return self.map(self.fetch_subreddit, subreddits)
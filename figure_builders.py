@@ -0,0 +1,50 @@
+# Per-subreddit figures: kind -> builder(subreddit, posts, text_index, layout_cache).
+# Kept free of app state so precompute worker processes can import it. Each builder
+# imports its module on first use: between them they pull in sklearn, networkx and
+# plotly.express, which the app does not need to start serving.
+
+def build_keyword(subreddit, posts, text_index, layout_cache):
+    from keyword_graph import create_keyword_graph
+    return create_keyword_graph(subreddit, text_index, layout_cache=layout_cache)
+
+def build_top_words(subreddit, posts, text_index, layout_cache):
+    from top_words_graph import create_top_words_graph
+    return create_top_words_graph(subreddit, text_index)
+
+def build_user(subreddit, posts, text_index, layout_cache):
+    from user_karma_graph import create_user_karma_graph
+    return create_user_karma_graph(subreddit, posts)
+
+def build_bubble(subreddit, posts, text_index, layout_cache):
+    from scatter_plot import create_user_karma_time_scatter
+    return create_user_karma_time_scatter(subreddit, posts)
+
+def build_cooccurrence(subreddit, posts, text_index, layout_cache):
+    from cooccurrence_graph import create_cooccurrence_graph
+    return create_cooccurrence_graph(subreddit, text_index, layout_cache=layout_cache)
+
+FIGURE_BUILDERS = {
+    'keyword': build_keyword,
+    'top_words': build_top_words,
+    'user': build_user,
+    'bubble': build_bubble,
+    'cooccurrence': build_cooccurrence,
+}
+
+# Figures of a subreddit's sampled comments: kind -> builder(subreddit, comment_index, layout_cache)
+def build_comment_words(subreddit, comment_index, layout_cache):
+    from top_words_graph import create_top_words_graph
+    return create_top_words_graph(subreddit, comment_index, label='Comment Words')
+
+def build_comment_cooccurrence(subreddit, comment_index, layout_cache):
+    from cooccurrence_graph import create_cooccurrence_graph
+    return create_cooccurrence_graph(subreddit, comment_index, layout_cache=layout_cache,
+                                     kind='comment_cooccurrence', label='Comment Co-Occurrence')
+
+COMMENT_FIGURE_BUILDERS = {
+    'comment_words': build_comment_words,
+    'comment_cooccurrence': build_comment_cooccurrence,
+}
+
+# Layout cache keys each network figure reads and writes
+LAYOUT_KINDS = ('keyword', 'cooccurrence', 'comment_cooccurrence')
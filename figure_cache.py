@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from metrics import metrics
+
+CACHE_VERSION = 2  # Bump when figure builders change their output
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+TOUCH_FRACTION = 0.1  # Reads refresh an entry's LRU time only once it is this much of the TTL old
+EVICTION_INTERVAL_WRITES = 100  # Writes between eviction passes; the cache may overshoot by this many
+
+# Structured cache key; `snapshot` is the snapshot version the figure belongs to, or
+# 'blob' for content-addressed data shared by every snapshot that has it
+FigureKey = namedtuple('FigureKey', ['snapshot', 'subreddit', 'kind'])
+
+def serialize_key(key):
+    return f"v{CACHE_VERSION}|{key.snapshot}|{key.subreddit}|{key.kind}"
+
+def meta_key(name):
+    return f"v{CACHE_VERSION}|meta|{name}"
+
+
+class MemoryBackend:
+    # In-process LRU; entries stored with expires_at=None are pinned and never evicted
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._pinned:
+                return self._pinned[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            if expires_at is None:
+                self._pinned[key] = value
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pin(self, key):
+        # Pins an entry that is still present; False when there is none
+        with self._lock:
+            if key in self._pinned:
+                return True
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] < time.time():
+                return False
+            self._pinned[key] = entry[0]
+            return True
+
+    def unpin(self, keys, expires_at):
+        # Pinned entries become ordinary ones that expire at expires_at
+        with self._lock:
+            for key in keys:
+                if key in self._pinned:
+                    self._entries[key] = (self._pinned.pop(key), expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteBackend:
+    # Disk-backed LRU shared by every worker process that opens the same file. The LRU
+    # order only needs to be roughly right: reads write back their access time rarely,
+    # so they stay read-only transactions, and eviction runs in batches.
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, touch_interval=DEFAULT_TTL_SECONDS * TOUCH_FRACTION):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS figures ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)')
+        self._connection().execute('CREATE INDEX IF NOT EXISTS figures_accessed ON figures (accessed_at)')
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT value, expires_at, accessed_at FROM figures WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)',
+            (key, now)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        # Pinned entries are never evicted, so their access time does not matter
+        if expires_at is not None and now - accessed_at >= self.touch_interval:
+            connection.execute('UPDATE figures SET accessed_at = ? WHERE key = ?', (now, key))
+        return zlib.decompress(value).decode('utf-8')
+
+    def set(self, key, value, expires_at):
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            'INSERT OR REPLACE INTO figures (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, zlib.compress(value.encode('utf-8')), expires_at, now))
+        with self._writes_lock:
+            self._writes += 1
+            evict = self._writes >= EVICTION_INTERVAL_WRITES
+            if evict:
+                self._writes = 0
+        if evict:
+            self.evict()
+
+    def pin(self, key):
+        cursor = self._connection().execute(
+            'UPDATE figures SET expires_at = NULL WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)',
+            (key, time.time()))
+        return cursor.rowcount > 0
+
+    def unpin(self, keys, expires_at):
+        self._connection().executemany(
+            'UPDATE figures SET expires_at = ?, accessed_at = ? WHERE key = ? AND expires_at IS NULL',
+            [(expires_at, time.time(), key) for key in keys])
+
+    def evict(self):
+        connection = self._connection()
+        connection.execute('DELETE FROM figures WHERE expires_at < ?', (time.time(),))
+        # Everything past the newest max_entries, walking the accessed_at index
+        connection.execute(
+            'DELETE FROM figures WHERE key IN ('
+            'SELECT key FROM figures WHERE expires_at IS NOT NULL ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,))
+
+
+class FigureCache:
+    # Stores figures as JSON so any process can serve them without rebuilding
+    def __init__(self, backend, ttl=DEFAULT_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get_json(self, key):
+        value = self.backend.get(serialize_key(key))
+        metrics.increment('figure_cache', result='hit' if value is not None else 'miss', kind=key.kind)
+        return value
+
+    def put_json(self, key, value, pinned=False):
+        # Pinned entries stay until unpinned, however long the TTL or the LRU
+        self.backend.set(serialize_key(key), value, None if pinned else time.time() + self.ttl)
+
+    def pin(self, key):
+        # Keeps an existing entry without rewriting it; False when it has to be written
+        return self.backend.pin(serialize_key(key))
+
+    def unpin(self, keys):
+        # Pinned entries expire after the usual TTL from now on
+        self.backend.unpin([serialize_key(key) for key in keys], time.time() + self.ttl)
+
+    def get(self, key):
+        # Plain dicts are valid Dash figures and skip plotly's validation on the way out
+        value = self.get_json(key)
+        return json.loads(value) if value is not None else None
+
+    def put(self, key, fig):
+        with metrics.timer('figure_serialization', kind=key.kind):
+            value = fig.to_json()
+        self.put_json(key, value)
+
+    def get_meta(self, name):
+        return self.backend.get(meta_key(name))
+
+    def set_meta(self, name, value):
+        self.backend.set(meta_key(name), value, None)
@@ -0,0 +1,109 @@
+import time
+from metrics import metrics
+
+COMMUNITY_BUDGET_SECONDS = 2.0  # Per graph, whichever method runs
+LOUVAIN_MAX_EDGES = 5000  # Larger graphs go straight to label propagation
+LABEL_PROPAGATION_MAX_EDGES = 200000  # Larger still, only connected components
+LABEL_PROPAGATION_CHECK_NODES = 1024  # Nodes relabelled between deadline checks
+COMMUNITY_SEED = 42
+
+# Seconds per edge of the slowest first Louvain level seen in this process
+_louvain_cost = {'seconds_per_edge': 0.0}
+
+def _louvain(G, deadline):
+    # Each level of Louvain is a complete, coarser partition, but a level cannot be
+    # stopped halfway. The next one is only started when the time left covers what the
+    # previous one took; later levels work on a coarser graph and are no slower.
+    import networkx as nx
+    started = time.perf_counter()
+    first = True
+    partition = None
+    for partition in nx.community.louvain_partitions(G, weight='weight', seed=COMMUNITY_SEED):
+        finished = time.perf_counter()
+        if first:
+            _louvain_cost['seconds_per_edge'] = max(_louvain_cost['seconds_per_edge'],
+                                                    (finished - started) / max(G.number_of_edges(), 1))
+            first = False
+        if deadline - finished < finished - started:
+            metrics.increment('communities_budget_exhausted', method='louvain')
+            break
+        started = finished
+    return partition
+
+def _label_propagation(G, deadline):
+    # Asynchronous label propagation that checks the deadline every few nodes. Labels
+    # are a valid partition after any step, so stopping early only merges less.
+    import random
+    rng = random.Random(COMMUNITY_SEED)
+    labels = {node: number for number, node in enumerate(G)}
+    nodes = list(G)
+    changed = True
+    while changed:
+        rng.shuffle(nodes)
+        changed = False
+        for position, node in enumerate(nodes):
+            if position % LABEL_PROPAGATION_CHECK_NODES == 0 and time.perf_counter() >= deadline:
+                metrics.increment('communities_budget_exhausted', method='label_propagation')
+                changed = False
+                break
+            weights = {}
+            for neighbor, data in G[node].items():
+                weights[labels[neighbor]] = weights.get(labels[neighbor], 0) + data.get('weight', 1)
+            if not weights:
+                continue
+            best = max(weights.values())
+            # Keeping the current label on ties lets the sweeps converge
+            if weights.get(labels[node]) != best:
+                labels[node] = min(label for label, weight in weights.items() if weight == best)
+                changed = True
+    members = {}
+    for node, label in labels.items():
+        members.setdefault(label, set()).add(node)
+    return members.values()
+
+def detect_communities(G, budget=COMMUNITY_BUDGET_SECONDS):
+    # Returns node -> community number, the largest community being 0. networkx is
+    # imported on first use, like in graph_layout.
+    import networkx as nx
+    if len(G) == 0:
+        return {}
+    deadline = time.perf_counter() + budget
+    num_edges = G.number_of_edges()
+    # Louvain's first level always runs to the end, so it is only tried when graphs of
+    # this size have finished one in time before
+    if num_edges <= LOUVAIN_MAX_EDGES and _louvain_cost['seconds_per_edge'] * num_edges <= budget:
+        method = 'louvain'
+    elif num_edges <= LABEL_PROPAGATION_MAX_EDGES:
+        method = 'label_propagation'
+    else:
+        # One linear pass; nothing cheaper still yields a partition
+        method = 'components'
+
+    with metrics.timer('communities', method=method):
+        if method == 'louvain':
+            communities = _louvain(G, deadline)
+        elif method == 'label_propagation':
+            communities = _label_propagation(G, deadline)
+        else:
+            communities = nx.connected_components(G)
+        communities = sorted(communities, key=lambda community: (-len(community), min(map(str, community))))
+    return {node: number for number, community in enumerate(communities) for node in community}
+
+def match_communities(communities, previous):
+    # Renumbers communities after the ones of the previous refresh they overlap most,
+    # so a cluster keeps its colour while the graph changes
+    members = {}
+    for node, number in communities.items():
+        members.setdefault(number, []).append(node)
+    renumbered, used = {}, set()
+    for number in sorted(members, key=lambda number: -len(members[number])):
+        overlap = {}
+        for node in members[number]:
+            if node in previous and previous[node] not in used:
+                overlap[previous[node]] = overlap.get(previous[node], 0) + 1
+        renumbered[number] = max(overlap, key=lambda old: (overlap[old], -old)) if overlap else None
+        used.add(renumbered[number])
+
+    unused = (number for number in range(len(members) + len(used)) if number not in used)
+    renumbered = {number: old if old is not None else next(unused) for number, old in renumbered.items()}
+    return {node: renumbered[number] for node, number in communities.items()}
@@ -0,0 +1,147 @@
+import threading
+import numpy as np
+from graph_analytics import COMMUNITY_BUDGET_SECONDS, detect_communities, match_communities
+from metrics import metrics
+
+COLD_START_ITERATIONS = 50  # networkx spring_layout default
+WARM_START_ITERATIONS = 15  # Budget when starting from the previous positions
+REUSE_SIMILARITY = 0.9  # Edge-set Jaccard similarity above which the old layout is kept
+ARRAY_LAYOUT_MIN_NODES = 300  # Switch to the array backend from this graph size
+REPULSION_CHUNK = 512  # Rows of the pairwise repulsion computed at once
+LAYOUT_SEED = 42
+
+def edge_similarity(edges_a, edges_b):
+    if not edges_a and not edges_b:
+        return 1.0
+    return len(edges_a & edges_b) / len(edges_a | edges_b)
+
+def array_layout(G, pos=None, iterations=COLD_START_ITERATIONS, k=None, seed=LAYOUT_SEED):
+    # Fruchterman-Reingold on numpy arrays: chunked pairwise repulsion, edge-list attraction
+    import networkx as nx
+    nodes = list(G)
+    n = len(nodes)
+    if n == 0:
+        return {}
+
+    rng = np.random.default_rng(seed)
+    positions = rng.random((n, 2))
+    if pos:
+        known = [i for i, node in enumerate(nodes) if node in pos]
+        if known:
+            positions[known] = np.array([pos[nodes[i]] for i in known], dtype=float)
+    if n == 1:
+        return {nodes[0]: np.zeros(2)}
+
+    adjacency = nx.to_scipy_sparse_array(G, nodelist=nodes, weight='weight', format='coo')
+    rows, cols, weights = adjacency.row, adjacency.col, adjacency.data.astype(float)
+
+    k = k if k is not None else np.sqrt(1.0 / n)
+    # Same cooling schedule networkx uses
+    temperature = max(np.ptp(positions[:, 0]), np.ptp(positions[:, 1])) * 0.1
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        displacement = np.zeros((n, 2))
+
+        x, y = positions[:, 0], positions[:, 1]
+        for start in range(0, n, REPULSION_CHUNK):
+            stop = start + REPULSION_CHUNK
+            dx = x[start:stop, None] - x[None, :]
+            dy = y[start:stop, None] - y[None, :]
+            force = k * k / np.maximum(dx * dx + dy * dy, 1e-4)
+            displacement[start:stop, 0] += (dx * force).sum(axis=1)
+            displacement[start:stop, 1] += (dy * force).sum(axis=1)
+
+        delta = positions[rows] - positions[cols]
+        distance = np.maximum(np.linalg.norm(delta, axis=1), 0.01)
+        np.add.at(displacement, rows, -delta * (weights * distance / k)[:, None])
+
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 0.01)
+        positions += displacement * (temperature / length)[:, None]
+        temperature -= cooling
+
+    positions = nx.rescale_layout(positions)
+    return dict(zip(nodes, positions))
+
+def compute_layout(G, pos=None, iterations=COLD_START_ITERATIONS, k=None):
+    # networkx is imported here rather than at the top so LayoutCache stays cheap to import
+    import networkx as nx
+    if len(G) >= ARRAY_LAYOUT_MIN_NODES:
+        with metrics.timer('layout', backend='array'):
+            return array_layout(G, pos=pos, iterations=iterations, k=k)
+    with metrics.timer('layout', backend='spring'):
+        return nx.spring_layout(G, pos=pos, iterations=iterations, k=k, seed=LAYOUT_SEED)
+
+
+class LayoutCache:
+    # Node positions and communities from the previous refresh, keyed by (graph kind, subreddit)
+    def __init__(self, reuse_similarity=REUSE_SIMILARITY):
+        self.reuse_similarity = reuse_similarity
+        self._entries = {}
+        self._communities = {}
+        self._lock = threading.Lock()
+
+    def layout(self, key, G, k=None):
+        edges = {frozenset(edge) for edge in G.edges()}
+        with self._lock:
+            previous = self._entries.get(key)
+
+        if previous is None:
+            metrics.increment('layout_cache', result='cold')
+            pos = compute_layout(G, iterations=COLD_START_ITERATIONS, k=k)
+        else:
+            previous_pos, previous_edges = previous
+            if all(node in previous_pos for node in G) and \
+                    edge_similarity(edges, previous_edges) >= self.reuse_similarity:
+                # Barely changed: keep every node where it was
+                metrics.increment('layout_cache', result='reuse')
+                return {node: previous_pos[node] for node in G}
+            initial = {node: previous_pos[node] for node in G if node in previous_pos}
+            metrics.increment('layout_cache', result='warm')
+            pos = compute_layout(G, pos=initial or None, iterations=WARM_START_ITERATIONS, k=k)
+
+        with self._lock:
+            self._entries[key] = (pos, edges)
+        return pos
+
+    def communities(self, key, G, budget=COMMUNITY_BUDGET_SECONDS):
+        edges = {frozenset(edge) for edge in G.edges()}
+        with self._lock:
+            previous = self._communities.get(key)
+
+        if previous is not None:
+            previous_communities, previous_edges = previous
+            if all(node in previous_communities for node in G) and \
+                    edge_similarity(edges, previous_edges) >= self.reuse_similarity:
+                metrics.increment('community_cache', result='reuse')
+                return {node: previous_communities[node] for node in G}
+        metrics.increment('community_cache', result='miss')
+        communities = detect_communities(G, budget=budget)
+        if previous is not None:
+            communities = match_communities(communities, previous[0])
+
+        with self._lock:
+            self._communities[key] = (communities, edges)
+        return communities
+
+    def export(self, keys):
+        # Entries for these keys, to seed a cache in another process
+        with self._lock:
+            return ({key: self._entries[key] for key in keys if key in self._entries},
+                    {key: self._communities[key] for key in keys if key in self._communities})
+
+    def update(self, entries):
+        layouts, communities = entries
+        with self._lock:
+            self._entries.update(layouts)
+            self._communities.update(communities)
+
+def layout_graph(G, layout_cache=None, key=None, k=None):
+    if layout_cache is None:
+        return compute_layout(G, k=k)
+    return layout_cache.layout(key, G, k=k)
+
+def graph_communities(G, layout_cache=None, key=None, budget=COMMUNITY_BUDGET_SECONDS):
+    if layout_cache is None:
+        return detect_communities(G, budget=budget)
+    return layout_cache.communities(key, G, budget=budget)
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+# Stats table column -> SQL column
+STATS_COLUMNS = {
+    'Posts in Last 24 Hours': 'posts',
+    'Total Karma in Last 24 Hours': 'karma',
+    'Total Comments in Last 24 Hours': 'comments',
+    'Subscribers': 'subscribers',
+    'SFW Posts': 'sfw_posts',
+    'NSFW Posts': 'nsfw_posts',
+    'SFW Comments': 'sfw_comments',
+    'NSFW Comments': 'nsfw_comments',
+}
+
+
+class HistoryStore:
+    # Append-only per-subreddit stats for every snapshot, indexed by (subreddit, timestamp).
+    # With min_interval, appends closer together than that are skipped.
+    def __init__(self, path, min_interval=0):
+        self.path = path
+        self.min_interval = min_interval
+        self._last_append = 0
+        self._local = threading.local()
+        columns = ', '.join(f'{column} INTEGER' for column in STATS_COLUMNS.values())
+        connection = self._connection()
+        connection.execute(f'CREATE TABLE IF NOT EXISTS subreddit_stats ('
+                           f'subreddit TEXT NOT NULL, timestamp REAL NOT NULL, {columns})')
+        connection.execute('CREATE INDEX IF NOT EXISTS subreddit_stats_time '
+                           'ON subreddit_stats (subreddit, timestamp)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def append(self, subreddit_stats_df, timestamp=None):
+        timestamp = timestamp or time.time()
+        if timestamp - self._last_append < self.min_interval:
+            return
+        self._last_append = timestamp
+        # Subscribers can be missing ('N/A'); those are stored as NULL
+        values = subreddit_stats_df[list(STATS_COLUMNS)].apply(pd.to_numeric, errors='coerce')
+        rows = [[subreddit, timestamp] + [None if pd.isna(value) else int(value) for value in row]
+                for subreddit, row in zip(subreddit_stats_df['Subreddit'], values.itertuples(index=False))]
+
+        placeholders = ', '.join('?' * (len(STATS_COLUMNS) + 2))
+        with self._connection() as connection:
+            connection.executemany(f'INSERT INTO subreddit_stats VALUES ({placeholders})', rows)
+
+    def query(self, subreddit, days=7):
+        # Stats for one subreddit over the last `days` days, oldest first
+        since = time.time() - days * 24 * 60 * 60
+        history_df = pd.read_sql_query(
+            'SELECT * FROM subreddit_stats WHERE subreddit = ? AND timestamp >= ? ORDER BY timestamp',
+            self._connection(), params=(subreddit, since))
+        history_df['time'] = pd.to_datetime(history_df['timestamp'], unit='s')
+        return history_df
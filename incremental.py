@@ -0,0 +1,63 @@
+import time
+
+WINDOW_SECONDS = 24 * 60 * 60  # Rolling window the dashboard reports on
+RESCORE_MAX_AGE_SECONDS = 6 * 60 * 60  # Younger posts still gain karma and comments
+
+
+class SubredditState:
+    def __init__(self, posts, subscribers):
+        self.posts = posts
+        self.subscribers = subscribers
+        self.watermark = max(posts.created_utc, default=0)  # Newest created_utc seen
+
+    def copy(self):
+        return SubredditState(self.posts.copy(), self.subscribers)
+
+
+class IncrementalIngestor:
+    # Keeps a rolling window of posts per subreddit. The first refresh of a subreddit is
+    # a full top-of-day crawl; later refreshes only fetch posts newer than the watermark,
+    # re-score recent posts and drop posts that leave the window. refresh() returns
+    # copies, so a snapshot never sees a later refresh.
+    def __init__(self, fetcher, window=WINDOW_SECONDS, rescore_max_age=RESCORE_MAX_AGE_SECONDS):
+        self.fetcher = fetcher
+        self.window = window
+        self.rescore_max_age = rescore_max_age
+        self.states = {}
+
+    def reset(self):
+        self.states = {}
+
+    def _update(self, subreddit, state, now):
+        print(f"Updating subreddit: {subreddit}")
+        state.posts.remove_older_than(now - self.window)
+
+        records, subscribers = self.fetcher.fetch_new(subreddit, state.watermark)
+        if subscribers is not None:
+            state.subscribers = subscribers
+
+        for record in records:
+            if record.id in state.posts:
+                continue
+            state.posts.append(record)
+            state.watermark = max(state.watermark, record.created_utc)
+
+        recent = [post_id for post_id, created in zip(state.posts.ids, state.posts.created_utc)
+                  if created >= now - self.rescore_max_age]
+        for record in self.fetcher.fetch_info(recent):
+            if record.id in state.posts:
+                state.posts.update(record)
+
+    def refresh(self, subreddits):
+        now = time.time()
+        # Subreddits that left the top list are forgotten so memory stays bounded
+        self.states = {subreddit: state for subreddit, state in self.states.items() if subreddit in subreddits}
+
+        new_subreddits = [subreddit for subreddit in subreddits if subreddit not in self.states]
+        for subreddit, posts, subscribers in self.fetcher.fetch_subreddits(new_subreddits):
+            self.states[subreddit] = SubredditState(posts, subscribers)
+
+        known_subreddits = [subreddit for subreddit in subreddits if subreddit not in new_subreddits]
+        self.fetcher.map(lambda subreddit: self._update(subreddit, self.states[subreddit], now), known_subreddits)
+
+        return {subreddit: self.states[subreddit].copy() for subreddit in subreddits}
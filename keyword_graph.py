@@ -1,30 +1,63 @@
 
+import numpy as np
 import networkx as nx
 import plotly.graph_objects as go
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.preprocessing import normalize
+from graph_layout import layout_graph
+from network_traces import edge_traces, node_positions, scatter_class
 
-def create_keyword_graph(subreddit, top_titles):
-    titles = [submission.title for submission in top_titles]
-    vectorizer = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(titles)
-    similarity_matrix = cosine_similarity(tfidf_matrix)
-    terms = vectorizer.get_feature_names_out()
+SIMILARITY_THRESHOLD = 0.1
+TOP_K_NEIGHBOURS = 5  # Strongest connections kept per keyword
+MAX_NODES = 200  # Keeps the layout tractable for large subreddits
 
-    G = nx.Graph()
+def keyword_edges(tfidf_matrix, threshold=SIMILARITY_THRESHOLD, top_k=TOP_K_NEIGHBOURS, max_nodes=MAX_NODES):
+    # Returns (term_indices, sources, targets, weights) with sources/targets indexing term_indices
+    tfidf_matrix = tfidf_matrix.tocsc()
+    term_indices = np.arange(tfidf_matrix.shape[1])
+
+    if max_nodes is not None and len(term_indices) > max_nodes:
+        term_weight = np.asarray(tfidf_matrix.sum(axis=0)).ravel()
+        term_indices = np.sort(np.argsort(-term_weight, kind='stable')[:max_nodes])
+        tfidf_matrix = tfidf_matrix[:, term_indices]
+
+    # Cosine similarity between terms (columns), kept sparse
+    term_vectors = normalize(tfidf_matrix.T.tocsr())
+    similarity = (term_vectors @ term_vectors.T).tocoo()
+
+    mask = (similarity.row != similarity.col) & (similarity.data > threshold)
+    rows, cols, weights = similarity.row[mask], similarity.col[mask], similarity.data[mask]
+
+    if top_k is not None and len(weights) > 0:
+        # Rank each term's neighbours by weight and keep the strongest top_k
+        order = np.lexsort((-weights, rows))
+        sorted_rows = rows[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_rows, sorted_rows, side='left')
+        order = order[rank < top_k]
+        rows, cols, weights = rows[order], cols[order], weights[order]
+
+    # An edge survives if it is in the top_k of either endpoint; dedupe (i, j) and (j, i)
+    # int64 pair keys: sparse indices are int32 and the product overflows past ~46k terms
+    sources, targets = np.minimum(rows, cols).astype(np.int64), np.maximum(rows, cols).astype(np.int64)
+    _, unique = np.unique(sources * len(term_indices) + targets, return_index=True)
 
-    num_terms = len(terms)
-    print(f"Number of terms: {num_terms}")
-    print(f"Shape of similarity matrix: {similarity_matrix.shape}")
+    return term_indices, sources[unique], targets[unique], weights[unique]
 
-    num_edges_added = 0
-    for i in range(num_terms):
-        for j in range(i + 1, num_terms):
-            if i < similarity_matrix.shape[0] and j < similarity_matrix.shape[1]:
+def create_keyword_graph(subreddit, text_index, max_nodes=MAX_NODES, layout_cache=None):
+    if text_index.num_terms == 0:
+        print("No keywords left after stopword filtering.")
+        return go.Figure()
+    tfidf_matrix = TfidfTransformer().fit_transform(text_index.doc_term)
+    terms = text_index.terms
+
+    print(f"Number of terms: {len(terms)}")
+
+    term_indices, sources, targets, weights = keyword_edges(tfidf_matrix, max_nodes=max_nodes)
+    node_terms = terms[term_indices]
 
-                if similarity_matrix[i, j] > 0.1:
-                    G.add_edge(terms[i], terms[j], weight=similarity_matrix[i, j])
-                    num_edges_added += 1
+    G = nx.Graph()
+    G.add_weighted_edges_from(zip(node_terms[sources], node_terms[targets], weights.tolist()))
+    num_edges_added = G.number_of_edges()
 
     print(f"Number of nodes: {len(G.nodes)}")
     print(f"Number of edges added: {num_edges_added}")
@@ -33,37 +66,26 @@ def create_keyword_graph(subreddit, top_titles):
         print("No meaningful keyword connections found.")
         return go.Figure()
 
-    MIN_DEGREE = 1
-    filtered_nodes = [node for node, degree in dict(G.degree()).items() if degree >= MIN_DEGREE]
-    G = G.subgraph(filtered_nodes).copy()
-
-    if len(G.nodes) == 0:
-        print("No significant keyword connections after filtering.")
-        return go.Figure()
+    pos = layout_graph(G, layout_cache, ('keyword', subreddit))
+    # Edge width follows the cosine similarity of the two keywords
+    scatter = scatter_class(len(G.nodes) + num_edges_added)
+    edges = list(G.edges(data='weight'))
+    edge_trace = edge_traces([(source, target) for source, target, _ in edges], pos,
+                             [weight * 5 for _, _, weight in edges], scatter=scatter)
 
-    pos = nx.spring_layout(G)
-    edge_trace = []
-    for edge in G.edges(data=True):
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_trace.append(go.Scatter(
-            x=[x0, x1, None],
-            y=[y0, y1, None],
-            line=dict(width=edge[2]['weight']*5, color='#888'),
-            hoverinfo='none',
-            mode='lines'))
-
-    node_trace = go.Scatter(
-        x=[pos[k][0] for k in G.nodes()],
-        y=[pos[k][1] for k in G.nodes()],
-        text=[f'{node}' for node in G.nodes()],
+    nodes = list(G.nodes())
+    node_xy = node_positions(nodes, pos)
+    node_trace = scatter(
+        x=node_xy[:, 0],
+        y=node_xy[:, 1],
+        text=[f'{node}' for node in nodes],
         mode='markers+text',
         hoverinfo='text',
         marker=dict(
             showscale=True,
             colorscale='YlGnBu',
             size=20,
-            color=[len(list(G.neighbors(node))) for node in G.nodes()],
+            color=[G.degree(node) for node in nodes],
             colorbar=dict(
                 thickness=15,
                 title='Node Connections',
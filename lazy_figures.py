@@ -0,0 +1,68 @@
+import json
+import threading
+from figure_cache import FigureKey
+from metrics import metrics
+
+
+class FigurePipeline:
+    # Builds each (subreddit, kind) figure the first time it is asked for, memoized in the
+    # figure cache under the snapshot version. Concurrent requests for the same figure
+    # wait for the one build already in flight instead of starting their own.
+    def __init__(self, figure_cache, builders, make_text_index, comment_builders=None):
+        self.figure_cache = figure_cache
+        self.builders = builders  # kind -> builder(subreddit, posts, text_index)
+        self.make_text_index = make_text_index
+        self.comment_builders = comment_builders or {}  # kind -> builder(subreddit, comment_index)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, snapshot, subreddit, kind):
+        value = self.get_json(snapshot, subreddit, kind)
+        return json.loads(value) if value is not None else None
+
+    def get_json(self, snapshot, subreddit, kind):
+        # The figure as serialized JSON, building it if needed
+        key = FigureKey(snapshot.version, subreddit, kind)
+        value = self.figure_cache.get_json(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+
+        if not owner:
+            metrics.increment('figure_build_deduplicated', kind=kind)
+            event.wait()
+            return self.figure_cache.get_json(key)
+
+        try:
+            fig = self._build(snapshot, subreddit, kind)
+            if fig is None:
+                return None
+            self.figure_cache.put(key, fig)
+            return self.figure_cache.get_json(key)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def _build(self, snapshot, subreddit, kind):
+        if kind in self.comment_builders:
+            comment_index = snapshot.get_comment_index(subreddit)
+            if comment_index is None:
+                return None
+            print(f"Building {kind} figure for subreddit: {subreddit}")
+            with metrics.timer('figure_builder', kind=kind):
+                return self.comment_builders[kind](subreddit, comment_index)
+
+        posts = snapshot.get_posts(subreddit)
+        if posts is None:
+            return None
+        print(f"Building {kind} figure for subreddit: {subreddit}")
+        with metrics.timer('text_index'):
+            text_index = snapshot.get_text_index(subreddit, self.make_text_index)
+        with metrics.timer('figure_builder', kind=kind):
+            return self.builders[kind](subreddit, posts, text_index)
@@ -0,0 +1,116 @@
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from incremental import WINDOW_SECONDS
+from sketches import HeavyHitters
+
+LEADERBOARD_SIZE = 15
+LEADERBOARD_BUCKET_SECONDS = 6 * 60 * 60  # Counts kept per 6 hours of the window, so old ones can be dropped
+
+
+class LeaderboardIndex:
+    # Karma per author and title word counts of each tracked subreddit over the window,
+    # kept across refreshes as mergeable sketches: one pair per subreddit and time bucket.
+    # Merging them all gives the global leaderboard, merging one subreddit's buckets its
+    # own view. Each refresh only feeds posts it has not seen, plus karma that seen posts
+    # gained since; karma a post loses later is not taken back. Expired buckets are
+    # dropped whole. capacity bounds every sketch; None keeps them exact.
+    def __init__(self, capacity=None, window=WINDOW_SECONDS, bucket_seconds=LEADERBOARD_BUCKET_SECONDS):
+        self.capacity = capacity
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self._users = {}  # subreddit -> bucket start -> HeavyHitters of author karma
+        self._words = {}  # subreddit -> bucket start -> HeavyHitters of word counts
+        self._fed = {}  # subreddit -> post id -> (bucket start, karma fed so far)
+
+    def update(self, posts_by_subreddit, text_indexes, now):
+        # text_indexes: subreddit -> TextIndex with one document per post row. Subreddits
+        # not given any more are dropped, like in AudienceIndex.
+        self._users = {subreddit: self._users.get(subreddit, {}) for subreddit in posts_by_subreddit}
+        self._words = {subreddit: self._words.get(subreddit, {}) for subreddit in posts_by_subreddit}
+        self._fed = {subreddit: self._fed.get(subreddit, {}) for subreddit in posts_by_subreddit}
+        cutoff = (now - self.window) // self.bucket_seconds * self.bucket_seconds
+
+        for subreddit, posts in posts_by_subreddit.items():
+            fed_posts = self._fed[subreddit]
+            karma, words = {}, {}  # bucket start -> item -> count
+            new_rows, new_starts = [], []
+            for row, (post_id, author, score, created) in enumerate(
+                    zip(posts.ids, posts.authors, posts.scores, posts.created_utc)):
+                fed = fed_posts.get(post_id)
+                if fed is None:
+                    start = created // self.bucket_seconds * self.bucket_seconds
+                    if start < cutoff:
+                        continue
+                    new_rows.append(row)
+                    new_starts.append(start)
+                    fed = fed_posts[post_id] = (start, 0)
+                start, fed_karma = fed
+                if score > fed_karma:
+                    fed_posts[post_id] = (start, score)
+                    if author is not None:
+                        bucket = karma.setdefault(start, {})
+                        bucket[author] = bucket.get(author, 0) + score - fed_karma
+
+            text_index = text_indexes.get(subreddit)
+            if text_index is not None and new_rows:
+                # Words of the new posts only, read from the tokens the index already holds
+                row_starts = np.full(text_index.num_docs, -1.0)
+                row_starts[new_rows] = new_starts
+                token_starts = row_starts[text_index.doc_of]
+                for start in set(new_starts):
+                    counts = np.bincount(text_index.tokens[token_starts == start], minlength=text_index.num_terms)
+                    words[start] = {text_index.terms[term_id]: int(counts[term_id])
+                                    for term_id in np.flatnonzero(counts).tolist()}
+
+            for buckets, batch in ((self._users[subreddit], karma), (self._words[subreddit], words)):
+                for start, counts in batch.items():
+                    buckets.setdefault(start, HeavyHitters(self.capacity)).update(counts.items())
+                for start in [start for start in buckets if start < cutoff]:
+                    del buckets[start]
+            if any(start < cutoff for start, _ in fed_posts.values()):
+                self._fed[subreddit] = {post_id: fed for post_id, fed in fed_posts.items() if fed[0] >= cutoff}
+
+    def _merged(self, sketches, subreddit):
+        subreddits = sketches.values() if subreddit is None else [sketches.get(subreddit, {})]
+        return HeavyHitters.merged([sketch for buckets in subreddits for sketch in buckets.values()], self.capacity)
+
+    def users(self, subreddit=None):
+        # Author karma of one subreddit, or of all of them when None
+        return self._merged(self._users, subreddit)
+
+    def words(self, subreddit=None):
+        return self._merged(self._words, subreddit)
+
+
+def create_leaderboard_graph(users, words, num_subreddits, top_n=LEADERBOARD_SIZE):
+    # Top users by karma and top words across every tracked subreddit, from the merged
+    # per-subreddit sketches. Approximate counts show how far they may be overestimated.
+    fig = make_subplots(rows=1, cols=2, horizontal_spacing=0.2,
+                        subplot_titles=('Top Users by Karma', 'Top Words'))
+    panels = [(users, 'Karma', 'rgba(255, 100, 100, 0.6)'), (words, 'Frequency', 'rgba(50, 171, 96, 0.6)')]
+    for column, (sketch, label, color) in enumerate(panels, start=1):
+        # Reverse the order to have the greatest at the top
+        top = sketch.top(top_n)[::-1]
+        if not top:
+            continue
+        items, estimates, lower_bounds = zip(*top)
+        error_x = None
+        if not sketch.exact:
+            error_x = dict(type='data', symmetric=False, array=[0] * len(top),
+                           arrayminus=[estimate - lower for estimate, lower in zip(estimates, lower_bounds)])
+        fig.add_trace(go.Bar(
+            x=estimates,
+            y=items,
+            orientation='h',
+            error_x=error_x,
+            marker=dict(color=color),
+            hovertemplate=f'%{{y}}: %{{x:,.0f}} {label.lower()}<extra></extra>',
+        ), row=1, col=column)
+        fig.update_xaxes(title_text=label, row=1, col=column)
+
+    title = f'Leaderboard Across {num_subreddits} Tracked Subreddits'
+    if not users.exact:
+        title += f' (approximate: counts at most {max(users.error_bound, words.error_bound):,.0f} too high)'
+    fig.update_layout(title=title, showlegend=False, height=500, margin=dict(l=120, r=20, t=90, b=70))
+    return fig
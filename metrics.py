@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = 'reddscan'
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(stage_or_name, label_key, field):
+    pairs = [(field, stage_or_name)] + list(label_key)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Metrics:
+    # Wall time and call counts per pipeline stage, plus event counters such as cache
+    # hits. While a trace is active every timed span is also recorded for a JSON trace file.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}  # (stage, labels) -> [count, total seconds, max seconds]
+        self._counters = {}  # (name, labels) -> count
+        self._trace = None
+        self._trace_started = None
+
+    def _after_fork(self):
+        # Another thread may have held the lock at fork time; it is never released in the child
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, started=started, **labels)
+
+    def timed(self, stage, **labels):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, stage, seconds, started=None, **labels):
+        key = (stage, _label_key(labels))
+        with self._lock:
+            timing = self._timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            if self._trace is not None and started is not None:
+                self._trace.append({
+                    'stage': stage,
+                    'labels': dict(labels),
+                    'start': started - self._trace_started,
+                    'seconds': seconds,
+                    'thread': threading.current_thread().name,
+                })
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def drain(self):
+        # Timings and counters recorded since the last drain, e.g. to ship from a worker process
+        with self._lock:
+            state = self._timings, self._counters
+            self._timings, self._counters = {}, {}
+        return state
+
+    def merge(self, state):
+        timings, counters = state
+        with self._lock:
+            for key, (count, total, longest) in timings.items():
+                timing = self._timings.setdefault(key, [0, 0.0, 0.0])
+                timing[0] += count
+                timing[1] += total
+                timing[2] = max(timing[2], longest)
+            for key, count in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + count
+
+    def start_trace(self):
+        with self._lock:
+            self._trace = []
+            self._trace_started = time.perf_counter()
+
+    def write_trace(self, path, **info):
+        with self._lock:
+            spans, self._trace = self._trace or [], None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(dict(info, spans=spans), file, indent=1)
+
+    def render_prometheus(self):
+        with self._lock:
+            timings = sorted(self._timings.items())
+            counters = sorted(self._counters.items())
+
+        lines = [f'# TYPE {PREFIX}_stage_seconds summary']
+        for (stage, label_key), (count, total, _) in timings:
+            labels = _format_labels(stage, label_key, 'stage')
+            lines.append(f'{PREFIX}_stage_seconds_count{labels} {count}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{labels} {total:.6f}')
+        lines.append(f'# TYPE {PREFIX}_stage_seconds_max gauge')
+        for (stage, label_key), (_, _, longest) in timings:
+            lines.append(f'{PREFIX}_stage_seconds_max{_format_labels(stage, label_key, "stage")} {longest:.6f}')
+        lines.append(f'# TYPE {PREFIX}_events_total counter')
+        for (name, label_key), count in counters:
+            lines.append(f'{PREFIX}_events_total{_format_labels(name, label_key, "event")} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by every module of the pipeline
+metrics = Metrics()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=metrics._after_fork)
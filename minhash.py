@@ -0,0 +1,71 @@
+import functools
+import hashlib
+import numpy as np
+
+NUM_PERMUTATIONS = 128  # Signature length; Jaccard estimates are off by about 1 / sqrt(128) = 0.09
+HASH_CHUNK = 4096  # Items hashed through every permutation at once
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+@functools.cache
+def _permutations(num_perm, seed):
+    # Random (a, b) of the hash functions (a * x + b) mod p, shared by every signature
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def _hash32(item):
+    # 32 bits so the permutations' a * x cannot overflow uint64; blake2b keeps signatures from
+    # different processes and refreshes comparable
+    return int.from_bytes(hashlib.blake2b(str(item).encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+class MinHash:
+    # Signature of a set for estimating Jaccard similarity in fixed memory. Adding items
+    # only ever lowers values, so signatures update incrementally and merge (set union)
+    # by element-wise minimum. Signatures compare only with the same num_perm and seed.
+    def __init__(self, num_perm=NUM_PERMUTATIONS, seed=0):
+        self.num_perm = num_perm
+        self.seed = seed
+        self.values = np.full(num_perm, MAX_HASH, dtype=np.uint64)
+
+    @property
+    def empty(self):
+        return bool((self.values == MAX_HASH).all())
+
+    def update(self, items):
+        hashes = np.fromiter((_hash32(item) for item in set(items)), dtype=np.uint64)
+        a, b = _permutations(self.num_perm, self.seed)
+        for start in range(0, len(hashes), HASH_CHUNK):
+            chunk = hashes[start:start + HASH_CHUNK]
+            permuted = (a[:, None] * chunk[None, :] + b[:, None]) % MERSENNE_PRIME & MAX_HASH
+            np.minimum(self.values, permuted.min(axis=1), out=self.values)
+
+    def merge(self, other):
+        if (self.num_perm, self.seed) != (other.num_perm, other.seed):
+            raise ValueError("MinHash signatures with different permutations cannot be merged")
+        np.minimum(self.values, other.values, out=self.values)
+
+    @classmethod
+    def merged(cls, signatures, num_perm=NUM_PERMUTATIONS, seed=0):
+        result = cls(num_perm, seed)
+        for signature in signatures:
+            result.merge(signature)
+        return result
+
+    def jaccard(self, other):
+        return float((self.values == other.values).mean())
+
+
+def similarity_matrix(signatures):
+    # Estimated Jaccard similarity of every pair: one row of comparisons per signature,
+    # independent of how large the sets are
+    matrix = np.vstack([signature.values for signature in signatures]) if signatures else np.empty((0, 0))
+    similarity = np.empty((len(signatures), len(signatures)))
+    for row in range(len(signatures)):
+        similarity[row] = (matrix[row] == matrix).mean(axis=1)
+    return similarity
+
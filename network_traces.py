@@ -0,0 +1,60 @@
+import numpy as np
+import plotly.graph_objects as go
+
+WIDTH_CLASSES = 6  # Distinct edge widths drawn, one line trace each
+WEBGL_MIN_POINTS = 1000  # Nodes plus edges from which a network renders with WebGL
+COORDINATE_DECIMALS = 4  # Plenty for a figure, and keeps the JSON short
+
+def scatter_class(num_points):
+    return go.Scattergl if num_points >= WEBGL_MIN_POINTS else go.Scatter
+
+def node_positions(nodes, pos):
+    return np.round(np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2), COORDINATE_DECIMALS)
+
+def scale_to_range(values, low, high):
+    # Linear map of values onto [low, high] pixels; all-equal values get low
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0 or values.max() == values.min():
+        return [float(low)] * len(values)
+    return (low + (values - values.min()) / (values.max() - values.min()) * (high - low)).tolist()
+
+def _segments(starts, ends):
+    # x0, x1, None for every edge, as one flat list
+    coordinates = np.empty((len(starts), 3), dtype=object)
+    coordinates[:, 0] = starts.tolist()
+    coordinates[:, 1] = ends.tolist()
+    coordinates[:, 2] = None
+    return coordinates.ravel().tolist()
+
+def edge_traces(edges, pos, widths, scatter=go.Scatter, color='#888', hover_texts=None):
+    # All edges in a handful of traces: widths are bucketed into WIDTH_CLASSES linear
+    # classes, each drawn as one line broken up by None. Hover texts, if given, sit on an
+    # invisible marker at each edge's midpoint.
+    if len(edges) == 0:
+        return []
+    widths = np.asarray(widths, dtype=float)
+    sources = node_positions([source for source, _ in edges], pos)
+    targets = node_positions([target for _, target in edges], pos)
+
+    bins = np.linspace(widths.min(), widths.max(), WIDTH_CLASSES + 1)[1:-1]
+    classes = np.digitize(widths, bins)
+    traces = []
+    for width_class in np.unique(classes):
+        members = classes == width_class
+        traces.append(scatter(
+            x=_segments(sources[members, 0], targets[members, 0]),
+            y=_segments(sources[members, 1], targets[members, 1]),
+            line=dict(width=float(widths[members].mean()), color=color),
+            hoverinfo='none',
+            mode='lines'))
+
+    if hover_texts is not None:
+        midpoints = np.round((sources + targets) / 2, COORDINATE_DECIMALS)
+        traces.append(scatter(
+            x=midpoints[:, 0],
+            y=midpoints[:, 1],
+            text=list(hover_texts),
+            mode='markers',
+            hoverinfo='text',
+            marker=dict(size=6, color=color, opacity=0)))
+    return traces
@@ -0,0 +1,176 @@
+import hashlib
+import json
+from array import array
+import numpy as np
+import pandas as pd
+
+# The only submission fields the dashboard reads
+POST_FIELDS = ('id', 'author', 'score', 'num_comments', 'created_utc', 'over_18', 'title', 'url')
+# Typed array columns -> numpy dtype of their buffer
+ARRAY_DTYPES = {'scores': np.int64, 'num_comments': np.int64, 'created_utc': np.float64, 'over_18': np.int8}
+
+
+class PostRecord:
+    __slots__ = POST_FIELDS
+
+    def __init__(self, id, author, score, num_comments, created_utc, over_18, title, url):
+        self.id = id
+        self.author = author
+        self.score = score
+        self.num_comments = num_comments
+        self.created_utc = created_utc
+        self.over_18 = over_18
+        self.title = title
+        self.url = url
+
+
+def record_from_dict(post):
+    return PostRecord(*(post[field] for field in POST_FIELDS))
+
+
+class PostStore:
+    # Columnar post storage: typed arrays for numbers, plain lists for strings
+    def __init__(self):
+        self.ids = []
+        self.authors = []
+        self.scores = array('q')
+        self.num_comments = array('q')
+        self.created_utc = array('d')
+        self.over_18 = array('b')
+        self.titles = []
+        self.urls = []
+        self._rows = {}  # post id -> row
+        self._author_rows = {}  # author -> rows, in insertion order
+
+    @classmethod
+    def from_dicts(cls, posts):
+        store = cls()
+        for post in posts:
+            store.append(record_from_dict(post))
+        return store
+
+    def append(self, record):
+        self._rows[record.id] = len(self.ids)
+        if record.author is not None:
+            self._author_rows.setdefault(record.author, []).append(len(self.ids))
+        self.ids.append(record.id)
+        self.authors.append(record.author)
+        self.scores.append(record.score)
+        self.num_comments.append(record.num_comments)
+        self.created_utc.append(record.created_utc)
+        self.over_18.append(bool(record.over_18))
+        self.titles.append(record.title)
+        self.urls.append(record.url)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, post_id):
+        return post_id in self._rows
+
+    def get(self, post_id):
+        row = self._rows.get(post_id)
+        return self.record(row) if row is not None else None
+
+    def update(self, record):
+        # Refresh the fields that change after posting; returns the previous record
+        row = self._rows[record.id]
+        previous = self.record(row)
+        self.scores[row] = record.score
+        self.num_comments[row] = record.num_comments
+        self.over_18[row] = bool(record.over_18)
+        return previous
+
+    def remove_older_than(self, cutoff_utc):
+        # Compacts the columns in place with one mask; returns how many posts were removed
+        if not self.ids:
+            return 0
+        keep = np.frombuffer(self.created_utc, dtype=np.float64) >= cutoff_utc
+        removed = len(keep) - int(keep.sum())
+        if removed:
+            for name, dtype in ARRAY_DTYPES.items():
+                setattr(self, name, array(getattr(self, name).typecode,
+                                          np.frombuffer(getattr(self, name), dtype=dtype)[keep].tobytes()))
+            for name in ('ids', 'authors', 'titles', 'urls'):
+                setattr(self, name, np.array(getattr(self, name), dtype=object)[keep].tolist())
+            self._reindex()
+        return removed
+
+    def copy(self):
+        # Column by column; the row indexes are copied rather than rebuilt
+        store = PostStore()
+        for name in ARRAY_DTYPES:
+            setattr(store, name, array(getattr(self, name).typecode, getattr(self, name)))
+        for name in ('ids', 'authors', 'titles', 'urls'):
+            setattr(store, name, list(getattr(self, name)))
+        store._rows = dict(self._rows)
+        store._author_rows = {author: list(rows) for author, rows in self._author_rows.items()}
+        return store
+
+    def _reindex(self):
+        self._rows = {post_id: row for row, post_id in enumerate(self.ids)}
+        self._author_rows = {}
+        for row, author in enumerate(self.authors):
+            if author is not None:
+                self._author_rows.setdefault(author, []).append(row)
+
+    def ids_digest(self):
+        # Changes whenever posts come or go; titles, authors and urls never change per id
+        return hashlib.blake2b('\0'.join(self.ids).encode('utf-8'), digest_size=16).hexdigest()
+
+    def digest(self):
+        # Changes whenever anything to_json writes does
+        digest = hashlib.blake2b(self.ids_digest().encode('ascii'), digest_size=16)
+        for name in ARRAY_DTYPES:
+            digest.update(getattr(self, name).tobytes())
+        return digest.hexdigest()
+
+    def author_rows(self, author):
+        return self._author_rows.get(author, [])
+
+    def top_authors(self, n):
+        # (author, karma) pairs for the n authors with the most karma, from one group-by
+        # over the columns; posts without an author are left out
+        scores = pd.Series(np.frombuffer(self.scores, dtype=np.int64) if self.ids else np.empty(0, dtype=np.int64))
+        karma = scores.groupby(pd.Series(self.authors, dtype=object), sort=False).sum().nlargest(n)
+        return list(zip(karma.index.tolist(), karma.tolist()))
+
+    def to_frame(self, rows=None):
+        rows = range(len(self)) if rows is None else rows
+        columns = self._columns()
+        return pd.DataFrame({field: [column[row] for row in rows] for field, column in zip(POST_FIELDS, columns)})
+
+    def to_arrays(self, fields=POST_FIELDS):
+        # numpy copies of the given columns; the numeric ones straight from the typed arrays
+        return {field: np.array(column, dtype=object) if isinstance(column, list) else np.array(column)
+                for field, column in zip(POST_FIELDS, self._columns()) if field in fields}
+
+    def to_json(self):
+        return json.dumps({field: list(column) for field, column in zip(POST_FIELDS, self._columns())})
+
+    @classmethod
+    def from_json(cls, text):
+        columns = json.loads(text)
+        store = cls()
+        store.ids, store.authors = columns['id'], columns['author']
+        store.scores, store.num_comments = array('q', columns['score']), array('q', columns['num_comments'])
+        store.created_utc, store.over_18 = array('d', columns['created_utc']), array('b', columns['over_18'])
+        store.titles, store.urls = columns['title'], columns['url']
+        store._reindex()
+        return store
+
+    def _columns(self):
+        return (self.ids, self.authors, self.scores, self.num_comments,
+                self.created_utc, self.over_18, self.titles, self.urls)
+
+    def record(self, row):
+        return PostRecord(self.ids[row], self.authors[row], self.scores[row], self.num_comments[row],
+                          self.created_utc[row], bool(self.over_18[row]), self.titles[row], self.urls[row])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def top(self, n):
+        rows = sorted(range(len(self)), key=self.scores.__getitem__, reverse=True)[:n]
+        return [self.record(row) for row in rows]
@@ -0,0 +1,182 @@
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from figure_builders import COMMENT_FIGURE_BUILDERS, FIGURE_BUILDERS, LAYOUT_KINDS
+from figure_cache import FigureKey
+from graph_layout import LayoutCache
+from metrics import metrics
+
+JOB_TIMEOUT_SECONDS = 60  # Budget for all figures of one subreddit
+POOL_GRACE_SECONDS = 30  # Extra wait for the whole batch before giving up on a stuck worker
+POOL_TERMINATE_SECONDS = 5  # Wait after SIGTERM before a worker of a discarded pool is killed
+# Workers start from a clean server process rather than a fork of the threaded app, which
+# may hold an import or other lock at fork time. Windows only has spawn.
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+# Imported once by the fork server, so every worker it forks starts warm
+POOL_PRELOAD = ('precompute', 'keyword_graph', 'cooccurrence_graph', 'top_words_graph', 'scatter_plot',
+                'user_karma_graph')
+
+
+class JobTimeout(Exception):
+    pass
+
+
+@contextmanager
+def _deadline(seconds):
+    # Interrupts the job from inside the worker, so the worker is free for the next one.
+    # Without SIGALRM (Windows) only the batch timeout in the parent applies.
+    if not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise JobTimeout()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def build_subreddit_figures(subreddit, posts, text_index, comment_index, kinds, layouts, timeout):
+    # Runs in a pool process. Returns (kind -> figure JSON, layout cache entries, metrics
+    # recorded by the job); on timeout whatever was finished is returned. Comment figures
+    # are built when the snapshot has sampled comments.
+    metrics.drain()  # Left over from earlier jobs, already returned with them
+    layout_cache = LayoutCache()
+    layout_cache.update(layouts)
+    figures = {}
+    try:
+        with _deadline(timeout):
+            for kind in kinds:
+                with metrics.timer('figure_builder', kind=kind):
+                    if kind in COMMENT_FIGURE_BUILDERS:
+                        figure = COMMENT_FIGURE_BUILDERS[kind](subreddit, comment_index, layout_cache)
+                    else:
+                        figure = FIGURE_BUILDERS[kind](subreddit, posts, text_index, layout_cache)
+                    figures[kind] = figure.to_json()
+    except JobTimeout:
+        print(f"Precompute for {subreddit} timed out after {timeout}s with {len(figures)} of {len(kinds)} figures")
+    return figures, layout_cache.export([(kind, subreddit) for kind in LAYOUT_KINDS]), metrics.drain()
+
+
+class FigurePrecomputer:
+    # Builds the figures of many subreddits at once in a process pool. Jobs get the
+    # columnar posts, the snapshot's text index and the previous layouts, and send back
+    # serialized figure JSON that goes straight into the figure cache, plus the layouts,
+    # communities and metrics the worker recorded. Figures that time out or fail are left to the
+    # lazy pipeline, which also serves every hover until they arrive.
+    def __init__(self, figure_cache, layout_cache, make_text_index, kinds=tuple(FIGURE_BUILDERS),
+                 max_workers=None, timeout=JOB_TIMEOUT_SECONDS):
+        self.figure_cache = figure_cache
+        self.layout_cache = layout_cache
+        self.make_text_index = make_text_index  # For snapshots loaded without their text indexes
+        self.kinds = tuple(kinds)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = None
+        self._thread = None
+
+    def _pool(self):
+        if self._executor is None:
+            context = multiprocessing.get_context(POOL_START_METHOD)
+            if POOL_START_METHOD == 'forkserver':
+                context.set_forkserver_preload(list(POOL_PRELOAD))
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._executor
+
+    def _reset_pool(self):
+        # shutdown() does not stop a worker stuck in C code, so the processes are ended
+        # explicitly instead of being left running next to the new pool
+        if self._executor is None:
+            return
+        processes = list((self._executor._processes or {}).values())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(POOL_TERMINATE_SECONDS)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def start(self, snapshot, subreddits):
+        # Precompute in the background, after the snapshot is already served. A batch
+        # requested while another runs waits for it, and only the newest one is kept.
+        with self._lock:
+            self._pending = snapshot, subreddits
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='figure-precompute', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._thread = None
+                    return
+                (snapshot, subreddits), self._pending = self._pending, None
+            try:
+                self.precompute(snapshot, subreddits)
+            except Exception:
+                print(f"Precompute for snapshot {snapshot.version} failed")
+                traceback.print_exc()
+
+    @metrics.timed('precompute')
+    def precompute(self, snapshot, subreddits):
+        pool = self._pool()
+        jobs = {}
+        for subreddit in subreddits:
+            posts = snapshot.get_posts(subreddit)
+            if posts is None:
+                continue
+            with metrics.timer('text_index'):
+                text_index = snapshot.get_text_index(subreddit, self.make_text_index)
+            comment_index = snapshot.get_comment_index(subreddit)
+            kinds = self.kinds + (tuple(COMMENT_FIGURE_BUILDERS) if comment_index is not None else ())
+            layouts = self.layout_cache.export([(kind, subreddit) for kind in LAYOUT_KINDS])
+            job = pool.submit(build_subreddit_figures, subreddit, posts, text_index, comment_index, kinds, layouts,
+                              self.timeout)
+            jobs[job] = subreddit, len(kinds)
+
+        built = 0
+        batch_timeout = self.timeout * math.ceil(len(jobs) / self.max_workers) + POOL_GRACE_SECONDS
+        try:
+            for job in as_completed(jobs, timeout=batch_timeout):
+                subreddit, num_kinds = jobs[job]
+                try:
+                    figures, layouts, worker_metrics = job.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory); the remaining jobs are lost with it
+                    print("Precompute pool broke, restarting it next refresh")
+                    self._reset_pool()
+                    break
+                except Exception:
+                    print(f"Precompute for {subreddit} failed")
+                    traceback.print_exc()
+                    metrics.increment('precompute_failed')
+                    continue
+                for kind, value in figures.items():
+                    self.figure_cache.put_json(FigureKey(snapshot.version, subreddit, kind), value)
+                metrics.merge(worker_metrics)
+                if len(figures) < num_kinds:
+                    metrics.increment('precompute_timed_out', num_kinds - len(figures))
+                self.layout_cache.update(layouts)
+                built += len(figures)
+        except TimeoutError:
+            # A worker is stuck; start over with a fresh pool next time
+            print(f"Precompute gave up after {batch_timeout}s")
+            self._reset_pool()
+        return built
@@ -0,0 +1,49 @@
+import threading
+import time
+
+# Reddit allows 1000 OAuth requests per 10 minute window
+DEFAULT_REQUESTS_PER_SECOND = 1000 / 600
+DEFAULT_BURST = 10
+RESERVED_REQUESTS = 5  # Headroom left for requests made outside the fetch workers
+
+
+class RateLimiter:
+    # Token bucket shared by every fetch worker. The refill rate follows the
+    # X-Ratelimit-Remaining/Reset values PRAW exposes through reddit.auth.limits.
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update(self, limits):
+        remaining = limits.get('remaining') if limits else None
+        reset_timestamp = limits.get('reset_timestamp') if limits else None
+        if remaining is None or reset_timestamp is None:
+            return
+
+        seconds_to_reset = max(reset_timestamp - time.time(), 1)
+        usable = max(remaining - RESERVED_REQUESTS, 0)
+
+        with self._lock:
+            self._refill(time.monotonic())
+            # Spread what is left of the quota evenly over the rest of the window
+            self.rate = max(min(self.max_rate, usable / seconds_to_reset), 1 / seconds_to_reset)
+            self.tokens = min(self.tokens, usable)
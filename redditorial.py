@@ -1,33 +1,105 @@
-import praw
-import pandas as pd
-from collections import defaultdict, Counter
-from datetime import datetime
+import functools
+import gzip
+import json
+import os
 import time
+from collections import Counter
 import plotly.graph_objects as go
-import plotly.express as px
-import networkx as nx
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State, Patch, no_update
 from dash import callback_context
-from scatter_plot import create_user_karma_time_scatter
-from keyword_graph import create_keyword_graph
-from top_words_graph import create_top_words_graph
-from user_karma_graph import create_user_karma_graph
-from cooccurrence_graph import create_cooccurrence_graph
-from config import client_id, client_secret, user_agent
+from figure_builders import COMMENT_FIGURE_BUILDERS, FIGURE_BUILDERS
+from snapshot import Snapshot, SnapshotScheduler
+from rate_limiter import RateLimiter
+from fetcher import SubredditFetcher
+from data_sources import PrawSource, RecordingSource, ReplaySource, SyntheticSource
+from incremental import IncrementalIngestor
+from streaming import StreamIngestor
+from graph_layout import LayoutCache
+from figure_cache import TOUCH_FRACTION, FigureCache, FigureKey, MemoryBackend, SQLiteBackend
+from lazy_figures import FigurePipeline
+from precompute import FigurePrecomputer
+from history_store import HistoryStore
+from trend_graph import create_trend_graph
+from aggregation import aggregate
+from leaderboard import LeaderboardIndex, create_leaderboard_graph
+from audience_overlap import AudienceIndex, create_audience_overlap_figures
+from comments import CommentSampler
+from metrics import metrics
+from flask import Response, request
 
 SEARCH_X_SUBREDDITS = 3
+FETCH_WORKERS = 8  # Subreddits fetched concurrently
+INCREMENTAL_INGESTION = True  # Only fetch new posts and re-score recent ones once warm
+INGESTION_MODE = os.environ.get('REDDSCAN_INGESTION', 'crawl')  # 'crawl' on every refresh, or 'stream' new posts
+STREAM_ALL = False  # In stream mode follow r/all instead of a multireddit of the tracked subreddits
+STREAM_REFRESH_SECONDS = 30  # Snapshot rebuild interval in stream mode; no crawling involved
+PREFETCH_TOP_K = 3  # Subreddits precomputed per refresh in stream mode; crawl mode precomputes all
+APPROXIMATE_ANALYTICS = os.environ.get('REDDSCAN_APPROXIMATE') == '1'  # Fixed-size leaderboard sketches instead of exact per-user/word counts
+SKETCH_CAPACITY = 500 if APPROXIMATE_ANALYTICS else None  # Items each leaderboard sketch keeps; None is exact
+COMMENT_INGESTION = os.environ.get('REDDSCAN_COMMENTS') == '1'  # Sample the best threads' comments, within a budget
+PRECOMPUTE_WORKERS = None  # Figure precompute processes; None uses every core
+PRECOMPUTE_TIMEOUT_SECONDS = 60  # Per subreddit; slower figures are built on first hover instead
+REFRESH_INTERVAL_SECONDS = 15 * 60  # How often the background worker rebuilds the snapshot
+SNAPSHOT_POLL_MS = 5 * 1000  # How often the page checks for a newer snapshot
+FIGURE_CACHE_PATH = 'figure_cache.sqlite'  # Shared by every worker process
+FIGURE_CACHE_MAX_ENTRIES = 5000
+REFRESH_LOCK_PATH = 'refresh.lock'  # Only the process holding this lock crawls Reddit
+HISTORY_DB_PATH = 'subreddit_history.sqlite'  # Stats of every snapshot, for trends
+TREND_DAYS = 7
+BUNDLE_CACHE_SIZE = 256  # Gzipped per-subreddit figure bundles kept in memory
+BUNDLE_MAX_AGE_SECONDS = 24 * 60 * 60  # Bundle URLs are versioned, so browsers may cache them long
+# Figure kind in a bundle -> the graph it is shown in
+FIGURE_BUNDLE_KINDS = {
+    'keyword': 'keyword-graph',
+    'top_words': 'top-words-graph',
+    'user': 'user-graph',
+    'bubble': 'bubble-chart',
+    'cooccurrence': 'cooccurrence-graph',
+    'trend': 'trend-graph',
+    'comment_words': 'comment-words-graph',
+    'comment_cooccurrence': 'comment-cooccurrence-graph',
+}
+REFRESH_TRACE_DIR = None  # Directory for per-refresh JSON traces, e.g. 'traces'
+DATA_SOURCE = os.environ.get('REDDSCAN_DATA_SOURCE', 'live')  # 'live', 'record', 'replay' or 'synthetic'
+RECORDING_DIR = os.environ.get('REDDSCAN_RECORDING_DIR', 'recordings')  # Written by 'record', read by 'replay'
+DATA_DIR = os.environ.get('REDDSCAN_DATA_DIR', '.')  # Where the SQLite files and the refresh lock live
+
+FIGURE_CACHE_PATH = os.path.join(DATA_DIR, FIGURE_CACHE_PATH)
+REFRESH_LOCK_PATH = os.path.join(DATA_DIR, REFRESH_LOCK_PATH)
+HISTORY_DB_PATH = os.path.join(DATA_DIR, HISTORY_DB_PATH)
 
 # Initialize the Reddit client
-reddit = praw.Reddit(client_id=client_id,
-                     client_secret=client_secret,
-                     user_agent=user_agent)
-
-# Cache for storing keyword graphs, top words, and user graphs
-keyword_graph_cache = {}
-top_words_cache = {}
-user_graph_cache = {}
+def make_reddit():
+    # Credentials and PRAW are only needed when talking to Reddit; the first fetch creates the client
+    import praw
+    from config import client_id, client_secret, user_agent
+    return praw.Reddit(client_id=client_id,
+                       client_secret=client_secret,
+                       user_agent=user_agent)
+
+# Where posts come from: live Reddit, live Reddit saved to disk, a saved recording, or generated data
+def make_data_source():
+    if DATA_SOURCE == 'live':
+        return PrawSource(make_reddit)
+    if DATA_SOURCE == 'record':
+        return RecordingSource(PrawSource(make_reddit), RECORDING_DIR)
+    if DATA_SOURCE == 'replay':
+        return ReplaySource(RECORDING_DIR)
+    if DATA_SOURCE == 'synthetic':
+        return SyntheticSource()
+    raise ValueError(f"Unknown data source: {DATA_SOURCE}")
+
+# Fetch workers share one rate limiter so together they stay within the API quota;
+# offline sources have no quota
+data_source = make_data_source()
+rate_limiter = RateLimiter() if DATA_SOURCE in ('live', 'record') else RateLimiter(rate=1e9, burst=1e9)
+fetcher = SubredditFetcher(data_source, rate_limiter, max_workers=FETCH_WORKERS)
+if INGESTION_MODE == 'stream':
+    ingestor = StreamIngestor(fetcher, stream_all=STREAM_ALL)
+    snapshot_interval = STREAM_REFRESH_SECONDS
+else:
+    ingestor = IncrementalIngestor(fetcher)
+    snapshot_interval = REFRESH_INTERVAL_SECONDS
 
 # Load custom stopwords from file
 def load_custom_stopwords(file_path):
@@ -35,104 +107,107 @@ def load_custom_stopwords(file_path):
         stopwords = set(line.strip().lower() for line in file) 
     return stopwords
 
-custom_stop_words = load_custom_stopwords('custom_stopwords.txt')
-
-# Reddit data fetching function
+custom_stop_words = load_custom_stopwords(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'custom_stopwords.txt'))
+
+# One stopword list for every word view. Importing sklearn takes most of a second, so
+# it waits until the first text index is built.
+@functools.cache
+def get_stop_words():
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return frozenset(custom_stop_words | ENGLISH_STOP_WORDS)
+
+# Tokenize a subreddit's titles once; every text figure reads this index
+def make_text_index(posts):
+    from text_index import TextIndex
+    return TextIndex(posts.titles, get_stop_words())
+
+# The refreshing process's indexes, kept while a subreddit's posts do not change
+@functools.cache
+def get_text_index_cache():
+    from text_index import TextIndexCache
+    return TextIndexCache(make_text_index)
+
+# Serialized figures shared between worker processes, bounded by LRU eviction and TTL
+FIGURE_CACHE_TTL_SECONDS = 2 * REFRESH_INTERVAL_SECONDS
+figure_cache = FigureCache(SQLiteBackend(FIGURE_CACHE_PATH, max_entries=FIGURE_CACHE_MAX_ENTRIES,
+                                         touch_interval=FIGURE_CACHE_TTL_SECONDS * TOUCH_FRACTION),
+                           ttl=FIGURE_CACHE_TTL_SECONDS)
+
+# Append-only per-subreddit stats history, at most one row per subreddit per crawl interval
+history_store = HistoryStore(HISTORY_DB_PATH, min_interval=REFRESH_INTERVAL_SECONDS)
+
+# Node positions carried over between refreshes so the network graphs stay stable
+layout_cache = LayoutCache()
+
+# Author signatures per subreddit, updated with each refresh's new posts
+audience_index = AudienceIndex()
+
+# Leaderboard sketches per subreddit and 6 hours of the window, fed with each refresh's new posts and karma
+leaderboard_index = LeaderboardIndex(SKETCH_CAPACITY)
+
+# Comments of each subreddit's best threads, re-sampled once per crawl interval only
+comment_sampler = CommentSampler(fetcher, get_stop_words)
+comment_samples = {'sampled_at': 0, 'indexes': {}}
+
+def sample_comments(posts_by_subreddit):
+    missing = [subreddit for subreddit in posts_by_subreddit if subreddit not in comment_samples['indexes']]
+    if time.time() - comment_samples['sampled_at'] >= REFRESH_INTERVAL_SECONDS:
+        comment_samples['indexes'] = comment_sampler.sample(posts_by_subreddit)
+        comment_samples['sampled_at'] = time.time()
+    elif missing:
+        # Subreddits new to the top list are sampled straight away
+        comment_samples['indexes'].update(comment_sampler.sample({subreddit: posts_by_subreddit[subreddit]
+                                                                  for subreddit in missing}))
+    return {subreddit: comment_samples['indexes'][subreddit] for subreddit in posts_by_subreddit}
+
+# The most active subreddits on r/all; in stream mode re-ranked once per crawl interval only
+subreddit_ranking = {'ranked_at': 0, 'top': None}
+
+def rank_subreddits():
+    if subreddit_ranking['top'] is None or time.time() - subreddit_ranking['ranked_at'] >= REFRESH_INTERVAL_SECONDS:
+        with metrics.timer('ingestion', step='rank_subreddits'):
+            top_submissions = fetcher.fetch_top('all')
+        top_subreddits = [post['subreddit'] for post in top_submissions]
+        subreddit_ranking['top'] = Counter(top_subreddits).most_common(SEARCH_X_SUBREDDITS)
+        subreddit_ranking['ranked_at'] = time.time()
+    return subreddit_ranking['top']
+
+# Fetch the top subreddits' posts and aggregate them in one columnar pass
 def get_reddit_data():
-    subreddit_activity = Counter()
-    subreddit_karma = Counter()
-    subreddit_comments = Counter()
-    subreddit_subscribers = defaultdict(lambda: 'N/A')
-    subreddit_sfw_count = Counter()
-    subreddit_nsfw_count = Counter()
-    subreddit_sfw_comments = Counter()
-    subreddit_nsfw_comments = Counter()
-    subreddit_users_karma = defaultdict(Counter)
-    subreddit_users_posts = defaultdict(list)
-    
-    top_submissions = list(reddit.subreddit('all').top(time_filter='day', limit=1000))
-    top_subreddits = [submission.subreddit.display_name for submission in top_submissions]
-    top_100_subreddits = Counter(top_subreddits).most_common(SEARCH_X_SUBREDDITS)
-    
-    for subreddit, _ in top_100_subreddits:
-        print(f"Processing subreddit: {subreddit}")
-        after = None
-        while True:
-            subreddit_posts = list(reddit.subreddit(subreddit).top(time_filter='day', limit=500, params={'after': after}))
-            
-            if not subreddit_posts:
-                break
-
-            for post in subreddit_posts:
-                subreddit_activity[subreddit] += 1
-                subreddit_karma[subreddit] += post.score
-                subreddit_comments[subreddit] += post.num_comments
-
-                if post.author is not None:
-                    subreddit_users_karma[subreddit][post.author.name] += post.score
-
-                subreddit_users_posts[subreddit].append(post)
-
-                if post.over_18:
-                    subreddit_nsfw_count[subreddit] += 1
-                    subreddit_nsfw_comments[subreddit] += post.num_comments
-                else:
-                    subreddit_sfw_count[subreddit] += 1
-                    subreddit_sfw_comments[subreddit] += post.num_comments
-            
-            after = subreddit_posts[-1].fullname
-            
-            if len(subreddit_posts) < 500:
-                break
-            
-            print('Pausing to stay within PRAW rate limits...')
-            time.sleep(1)
-
-        subreddit_obj = reddit.subreddit(subreddit)
-        subreddit_subscribers[subreddit] = subreddit_obj.subscribers
-    
-    return top_100_subreddits, subreddit_activity, subreddit_karma, subreddit_comments, subreddit_subscribers, subreddit_sfw_count, subreddit_nsfw_count, subreddit_sfw_comments, subreddit_nsfw_comments, subreddit_users_karma, subreddit_users_posts
-
-# Save data to CSV function
-def save_data_to_csv(top_subreddits, date, subreddit_activity, subreddit_karma, subreddit_comments, subreddit_subscribers, subreddit_sfw_count, subreddit_nsfw_count, subreddit_sfw_comments, subreddit_nsfw_comments):
-    subreddit_stats = []
-    for subreddit, _ in top_subreddits:
-        post_count = subreddit_activity[subreddit]
-        karma_count = subreddit_karma[subreddit]
-        comment_count = subreddit_comments[subreddit]
-        subscriber_count = subreddit_subscribers[subreddit]
-        sfw_percentage = (subreddit_sfw_count[subreddit] / post_count) * 100 if post_count > 0 else 0
-        nsfw_percentage = (subreddit_nsfw_count[subreddit] / post_count) * 100 if post_count > 0 else 0
-        subreddit_stats.append([subreddit, post_count, karma_count, comment_count, subscriber_count, 
-                                subreddit_sfw_count[subreddit], subreddit_nsfw_count[subreddit],
-                                subreddit_sfw_comments[subreddit], subreddit_nsfw_comments[subreddit],
-                                sfw_percentage, nsfw_percentage])
-    
-    subreddit_stats_df = pd.DataFrame(subreddit_stats, columns=['Subreddit', 'Posts in Last 24 Hours', 
-                                                                'Total Karma in Last 24 Hours', 'Total Comments in Last 24 Hours', 
-                                                                'Subscribers', 'SFW Posts', 'NSFW Posts', 
-                                                                'SFW Comments', 'NSFW Comments', 
-                                                                'SFW Posts %', 'NSFW Posts %'])
-    subreddit_stats_df.to_csv(f'subreddit_stats_{date}.csv', index=False)
-
-    return subreddit_stats_df
-
-# Pre-cache graphs
-def pre_cache_graphs(subreddits, subreddit_users_karma, posts_data):
-    for subreddit, _ in subreddits:
-        print(f"Pre-caching data for subreddit: {subreddit}")
-        top_posts = list(reddit.subreddit(subreddit).top(time_filter='day', limit=100))
-        keyword_fig = create_keyword_graph(subreddit, top_posts) 
-        keyword_graph_cache[subreddit] = keyword_fig
-        top_words_fig = create_top_words_graph(subreddit, top_posts, custom_stop_words)
-        top_words_cache[subreddit] = top_words_fig
-        user_fig = create_user_karma_graph(subreddit, subreddit_users_karma)
-        user_graph_cache[subreddit] = user_fig
-        bubble_chart_fig = create_user_karma_time_scatter(subreddit, subreddit_users_karma, posts_data)
-        user_graph_cache[subreddit + "_bubble"] = bubble_chart_fig
-        cooccurrence_fig = create_cooccurrence_graph(subreddit, top_posts, custom_stop_words)
-        user_graph_cache[subreddit + "_cooccurrence"] = cooccurrence_fig 
-
+    top_100_subreddits = rank_subreddits()
+
+    if not INCREMENTAL_INGESTION:
+        ingestor.reset()
+    with metrics.timer('ingestion', step='subreddits'):
+        states = ingestor.refresh([subreddit for subreddit, _ in top_100_subreddits])
+
+    posts = {subreddit: state.posts for subreddit, state in states.items()}
+    subscribers = {subreddit: state.subscribers for subreddit, state in states.items()}
+    return aggregate(top_100_subreddits, posts, subscribers)
+
+# Save snapshot stats to the history store
+@metrics.timed('history_write')
+def save_snapshot_stats(subreddit_stats_df):
+    history_store.append(subreddit_stats_df)
+
+# Figure builders, run the first time a figure is requested for a snapshot. The layout
+# cache is looked up on every call so it can be swapped out.
+figure_builders = {
+    kind: lambda subreddit, posts, text_index, build=build: build(subreddit, posts, text_index, layout_cache)
+    for kind, build in FIGURE_BUILDERS.items()
+}
+
+comment_figure_builders = {
+    kind: lambda subreddit, comment_index, build=build: build(subreddit, comment_index, layout_cache)
+    for kind, build in COMMENT_FIGURE_BUILDERS.items()
+}
+
+figure_pipeline = FigurePipeline(figure_cache, figure_builders, make_text_index, comment_figure_builders)
+# Gzipped hover bundles, per worker process
+bundle_cache = MemoryBackend(max_entries=BUNDLE_CACHE_SIZE)
+# Builds the figures of a fresh snapshot across all cores once it is published
+figure_precomputer = FigurePrecomputer(figure_cache, layout_cache, make_text_index,
+                                       max_workers=PRECOMPUTE_WORKERS, timeout=PRECOMPUTE_TIMEOUT_SECONDS)
 
 # Dash App Initialization
 app = Dash(__name__)
@@ -141,6 +216,8 @@ app = Dash(__name__)
 app.layout = html.Div([
     dcc.Location(id='url', refresh=True),  # Location component for URL redirection
     dcc.Store(id='subreddit-url-store'),  # Store component for subreddit URL
+    dcc.Store(id='snapshot-version'),  # Version of the snapshot currently shown
+    dcc.Interval(id='snapshot-poll', interval=SNAPSHOT_POLL_MS),  # Picks up newly built snapshots
     dcc.Graph(id='main-graph'),
     html.Script(src='https://cdnjs.cloudflare.com/ajax/libs/jquery/3.6.0/jquery.min.js'),
     html.Script(
@@ -166,26 +243,27 @@ app.layout = html.Div([
     ]),
     html.Div([
         dcc.Graph(id='cooccurrence-graph', style={'width': '100%', 'display': 'inline-block', 'vertical-align': 'top'}),
+    ]),
+    html.Div([
+        dcc.Graph(id='comment-words-graph', style={'width': '50%', 'display': 'inline-block', 'vertical-align': 'top'}),
+        dcc.Graph(id='comment-cooccurrence-graph', style={'width': '50%', 'display': 'inline-block', 'vertical-align': 'top'}),
+    ], style={} if COMMENT_INGESTION else {'display': 'none'}),
+    html.Div([
+        dcc.Graph(id='trend-graph', style={'width': '100%', 'display': 'inline-block', 'vertical-align': 'top'}),
+    ]),
+    html.Div([
+        dcc.Graph(id='leaderboard-graph', style={'width': '100%', 'display': 'inline-block', 'vertical-align': 'top'}),
+    ]),
+    html.Div([
+        dcc.Graph(id='audience-heatmap', style={'width': '50%', 'display': 'inline-block', 'vertical-align': 'top'}),
+        dcc.Graph(id='audience-graph', style={'width': '50%', 'display': 'inline-block', 'vertical-align': 'top'}),
     ])
 ])
 
 
-# Main graph update function
-@app.callback(
-    Output('main-graph', 'figure'),
-    Input('main-graph', 'id')
-)
-def update_main_graph(_):
-    top_subreddits, subreddit_activity, subreddit_karma, subreddit_comments, subreddit_subscribers, \
-    subreddit_sfw_count, subreddit_nsfw_count, subreddit_sfw_comments, subreddit_nsfw_comments, subreddit_users_karma, subreddit_users_posts = get_reddit_data()
-
-    pre_cache_graphs(top_subreddits, subreddit_users_karma, subreddit_users_posts)
-
-    subreddit_stats_df = save_data_to_csv(top_subreddits, datetime.now().strftime('%Y-%m-%d'),
-                                          subreddit_activity, subreddit_karma, subreddit_comments,
-                                          subreddit_subscribers, subreddit_sfw_count, subreddit_nsfw_count,
-                                          subreddit_sfw_comments, subreddit_nsfw_comments)
-
+# Main graph figure
+@metrics.timed('figure_builder', kind='main')
+def create_main_graph(subreddit_stats_df):
     subreddit_stats_df = subreddit_stats_df.sort_values(by='Total Karma in Last 24 Hours', ascending=False)
 
     hover_template_sfw = (
@@ -246,6 +324,92 @@ def update_main_graph(_):
 
     return fig
 
+# Build a snapshot from fresh aggregates; runs on the background refresh thread
+def build_snapshot(version):
+    result = get_reddit_data()
+    subreddit_stats_df = result.stats_df
+    save_snapshot_stats(subreddit_stats_df)
+
+    # Tokenize each subreddit's titles once at ingest, and again only when its posts
+    # change; the text figures read these indexes
+    with metrics.timer('text_index'):
+        text_indexes = get_text_index_cache().update(result.posts)
+    comment_indexes = sample_comments(result.posts) if COMMENT_INGESTION else None
+    snapshot = Snapshot(version, subreddit_stats_df, create_main_graph(subreddit_stats_df), figure_cache,
+                        posts=result.posts, text_indexes=text_indexes, comment_indexes=comment_indexes)
+
+    # Global top users and words, fed with this refresh's new posts and karma
+    with metrics.timer('figure_builder', kind='leaderboard'):
+        leaderboard_index.update(result.posts, text_indexes, time.time())
+        leaderboard = create_leaderboard_graph(leaderboard_index.users(), leaderboard_index.words(),
+                                               len(result.posts))
+    figure_cache.put(FigureKey(version, '', 'leaderboard'), leaderboard)
+
+    # Author overlap between every pair of subreddits, biggest subreddits first
+    with metrics.timer('figure_builder', kind='audience'):
+        audience_index.update(result.posts, time.time())
+        ranked = subreddit_stats_df.sort_values('Total Karma in Last 24 Hours', ascending=False)['Subreddit']
+        audience_heatmap, audience_graph = create_audience_overlap_figures(
+            audience_index.signatures(), list(ranked), layout_cache=layout_cache)
+    figure_cache.put(FigureKey(version, '', 'audience_heatmap'), audience_heatmap)
+    figure_cache.put(FigureKey(version, '', 'audience_graph'), audience_graph)
+
+    return snapshot
+
+# Per-subreddit figures are built after the snapshot is published, against its version;
+# hovers that come first build theirs lazily
+def precompute_figures(snapshot):
+    if INGESTION_MODE == 'stream':
+        precomputed = snapshot.stats_df.nlargest(PREFETCH_TOP_K, 'Total Karma in Last 24 Hours')['Subreddit']
+    else:
+        precomputed = snapshot.stats_df['Subreddit']
+    figure_precomputer.start(snapshot, list(precomputed))
+
+snapshot_scheduler = SnapshotScheduler(build_snapshot, snapshot_interval, figure_cache,
+                                       lock_path=REFRESH_LOCK_PATH, trace_dir=REFRESH_TRACE_DIR,
+                                       on_publish=precompute_figures)
+
+# WSGI entry point (e.g. gunicorn redditorial:server); each worker starts its refresh thread lazily
+server = app.server
+
+@server.before_request
+def start_background_refresh():
+    snapshot_scheduler.start()
+
+# Prometheus scrape endpoint with stage timings and cache hit rates
+@server.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+# Main graph update function; only reads the current snapshot
+@app.callback(
+    Output('main-graph', 'figure'),
+    Output('snapshot-version', 'data'),
+    Input('snapshot-poll', 'n_intervals'),
+    State('snapshot-version', 'data')
+)
+@metrics.timed('callback', name='update_main_graph')
+def update_main_graph(_, shown_version):
+    snapshot = snapshot_scheduler.current()
+
+    if snapshot is None:
+        if shown_version is None:
+            return go.Figure(layout=go.Layout(title='Collecting Reddit data...', height=450)), 0
+        return no_update, no_update
+
+    if snapshot.version == shown_version:
+        return no_update, no_update
+
+    if not shown_version:
+        return snapshot.main_figure, snapshot.version
+
+    # The page already shows a chart: send only the new bar data, keeping zoom and slider
+    patch = Patch()
+    for index, trace in enumerate(snapshot.main_figure['data']):
+        for field in ('x', 'y', 'customdata'):
+            patch['data'][index][field] = trace[field]
+    return patch, snapshot.version
+
 # Combined URL click callback for both subreddit and post URLs
 @app.callback(
     Output('url', 'href'),
@@ -253,6 +417,7 @@ def update_main_graph(_):
     Input('bubble-chart', 'clickData'),
     prevent_initial_call=True
 )
+@metrics.timed('callback', name='open_url_on_click')
 def open_url_on_click(main_click_data, bubble_click_data):
     ctx = callback_context
 
@@ -272,30 +437,140 @@ def open_url_on_click(main_click_data, bubble_click_data):
 
     return None
 
-# Update graphs callback
-@app.callback(
-    Output('keyword-graph', 'figure'),
-    Output('top-words-graph', 'figure'),
-    Output('user-graph', 'figure'),
-    Output('bubble-chart', 'figure'),
-    Output('cooccurrence-graph', 'figure'),
-    Input('main-graph', 'hoverData')
+# Hover switching runs in the browser: each subreddit's figures arrive as one bundle from
+# /figures/<version>/<subreddit>, complete bundles are kept per snapshot version, and
+# re-hovering their bar never goes back to the server
+app.clientside_callback(
+    """
+    function(hoverData, version) {
+        const kinds = %s;
+        const noUpdate = kinds.map(() => window.dash_clientside.no_update);
+        if (!hoverData || !hoverData.points || !hoverData.points.length || !version) {
+            return noUpdate;
+        }
+        if (window.reddscanBundleVersion !== version) {
+            window.reddscanBundleVersion = version;
+            window.reddscanBundles = {};
+        }
+        const bundles = window.reddscanBundles;
+        const subreddit = hoverData.points[0].x;
+        const show = bundle => kinds.map(kind => bundle[kind] || {data: [], layout: {}});
+        window.reddscanHovered = subreddit;
+
+        if (bundles[subreddit] && !(bundles[subreddit] instanceof Promise)) {
+            return show(bundles[subreddit]);
+        }
+        if (!bundles[subreddit]) {
+            bundles[subreddit] = fetch('/figures/' + version + '/' + encodeURIComponent(subreddit))
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(bundle => {
+                    // A bundle with missing figures is shown once and fetched again next hover
+                    if (bundle.complete === false) {
+                        delete bundles[subreddit];
+                    } else {
+                        bundles[subreddit] = bundle;
+                    }
+                    return bundle;
+                });
+        }
+        // Only the last hovered bar may update the graphs
+        return bundles[subreddit]
+            .then(bundle => window.reddscanHovered === subreddit ? show(bundle) : noUpdate)
+            .catch(() => {
+                delete bundles[subreddit];
+                return noUpdate;
+            });
+    }
+    """ % json.dumps(list(FIGURE_BUNDLE_KINDS)),
+    [Output(graph_id, 'figure') for graph_id in FIGURE_BUNDLE_KINDS.values()],
+    Input('main-graph', 'hoverData'),
+    State('snapshot-version', 'data'),
 )
-def update_graphs(hoverData):
-    if hoverData is None or 'points' not in hoverData or len(hoverData['points']) == 0:
-        print("No bar was hovered over.")
-        return go.Figure(), go.Figure(), go.Figure(), go.Figure(), go.Figure()
-
-    hovered_subreddit = hoverData['points'][0]['x']
-    print(f"Hovered subreddit: {hovered_subreddit}")
-
-    keyword_fig = keyword_graph_cache.get(hovered_subreddit, go.Figure())
-    top_words_fig = top_words_cache.get(hovered_subreddit, go.Figure())
-    user_fig = user_graph_cache.get(hovered_subreddit, go.Figure())
-    bubble_chart_fig = user_graph_cache.get(hovered_subreddit + "_bubble", go.Figure())
-    cooccurrence_fig = user_graph_cache.get(hovered_subreddit + "_cooccurrence", go.Figure())
 
-    return keyword_fig, top_words_fig, user_fig, bubble_chart_fig, cooccurrence_fig
+# All hover figures of one subreddit for one snapshot, gzipped once and cached. The URL
+# names the snapshot version, so browsers may keep a complete response until the next one.
+@server.route('/figures/<int:version>/<path:subreddit>')
+@metrics.timed('callback', name='figure_bundle')
+def figure_bundle(version, subreddit):
+    etag = f'{version}-{subreddit}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        complete = True
+    else:
+        body, complete = figure_bundle_gzip(version, subreddit)
+        if body is None:
+            return Response('Snapshot not available', status=404, headers={'Cache-Control': 'no-store'})
+        if request.accept_encodings['gzip']:
+            response = Response(body, mimetype='application/json', headers={'Content-Encoding': 'gzip'})
+        else:
+            response = Response(gzip.decompress(body), mimetype='application/json')
+    if complete:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={BUNDLE_MAX_AGE_SECONDS}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-store'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def figure_bundle_gzip(version, subreddit):
+    # (gzipped bundle or None, whether every figure is in it)
+    key = f'{version}|{subreddit}'
+    body = bundle_cache.get(key)
+    if body is not None:
+        return body, True
+
+    snapshot = snapshot_scheduler.current()
+    if snapshot is None or snapshot.version != version:
+        return None, False
+    kinds = list(FIGURE_BUILDERS)
+    if snapshot.get_comment_index(subreddit) is not None:
+        kinds += list(COMMENT_FIGURE_BUILDERS)
+    figures = {kind: figure_pipeline.get_json(snapshot, subreddit, kind) for kind in kinds}
+    figures['trend'] = create_trend_graph(subreddit, history_store.query(subreddit, TREND_DAYS), TREND_DAYS).to_json()
+    # A figure that failed to build is retried on the next request instead of being cached
+    complete = all(value is not None for value in figures.values())
+    metrics.increment('figure_bundles', result='complete' if complete else 'partial')
+    members = {kind: value for kind, value in figures.items() if value is not None}
+    members['complete'] = json.dumps(complete)
+    # The cached figures are JSON already; splice them together instead of re-encoding
+    bundle = '{' + ','.join(f'{json.dumps(kind)}:{value}' for kind, value in members.items()) + '}'
+    body = gzip.compress(bundle.encode('utf-8'), compresslevel=6)
+    if complete:
+        bundle_cache.set(key, body, time.time() + 2 * REFRESH_INTERVAL_SECONDS)
+    return body, complete
+
+# Global leaderboard, swapped in together with each new snapshot
+@app.callback(
+    Output('leaderboard-graph', 'figure'),
+    Input('snapshot-version', 'data')
+)
+@metrics.timed('callback', name='update_leaderboard_graph')
+def update_leaderboard_graph(version):
+    snapshot = snapshot_scheduler.current()
+    if not version or snapshot is None:
+        return go.Figure()
+    return snapshot.get_figure('', 'leaderboard') or go.Figure()
+
+# Cross-subreddit audience overlap, swapped in together with each new snapshot
+@app.callback(
+    Output('audience-heatmap', 'figure'),
+    Output('audience-graph', 'figure'),
+    Input('snapshot-version', 'data')
+)
+@metrics.timed('callback', name='update_audience_graphs')
+def update_audience_graphs(version):
+    snapshot = snapshot_scheduler.current()
+    if not version or snapshot is None:
+        return go.Figure(), go.Figure()
+    return (snapshot.get_figure('', 'audience_heatmap') or go.Figure(),
+            snapshot.get_figure('', 'audience_graph') or go.Figure())
 
 if __name__ == "__main__":
-    app.run_server(debug=True)
+    snapshot_scheduler.start()
+    # The reloader would start a second refresh worker in the parent process
+    app.run_server(debug=True, use_reloader=False)
@@ -1,45 +1,30 @@
+import pandas as pd
 import plotly.express as px
-from datetime import datetime
 import plotly.graph_objects as go 
 
-def create_user_karma_time_scatter(subreddit, users_karma, posts_data):
-    top_users = users_karma[subreddit].most_common(10)
+TOP_USERS = 10
+
+def create_user_karma_time_scatter(subreddit, posts, top_n=TOP_USERS):
+    top_users = posts.top_authors(top_n)
     
     if not top_users:
         print(f"No significant users found for subreddit: {subreddit}")
         return go.Figure()  # Return an empty figure
     
-    users = []
-    karma = []
-    times = []
-    titles = []
-    post_types = []
-    urls = []  # To store URLs of posts
+    # One frame with every post of the top users, looked up through the author index
+    rows = [row for user, _ in top_users for row in posts.author_rows(user)]
+    frame = posts.to_frame(rows)
 
-    for user, _ in top_users:
-        user_posts = [
-            post for post in posts_data[subreddit]
-            if post.author is not None and post.author.name == user
-        ]
-        for post in user_posts:
-            users.append(user)
-            karma.append(max(post.score, 2))  # Ensure minimum size is 2 (since 1 is default karma)
-            times.append(datetime.utcfromtimestamp(post.created_utc))  # Convert timestamp to datetime
-            
-            # Truncate the title if it exceeds 60 characters
-            truncated_title = (post.title[:60] + '...') if len(post.title) > 60 else post.title
-            titles.append(truncated_title)
-            
-            post_types.append("NSFW" if post.over_18 else "SFW")
-            urls.append(post.url)  # Cache the URL
+    # Reverse the order of the users to have the highest karma at the top
+    frame = frame.iloc[::-1]
 
-    # Reverse the order of the users list to have the highest karma at the top
-    users = list(users)[::-1]
-    karma = list(karma)[::-1]
-    times = list(times)[::-1]
-    titles = list(titles)[::-1]
-    post_types = list(post_types)[::-1]
-    urls = list(urls)[::-1]  # Reverse URLs to match the order
+    users = frame['author'].tolist()
+    karma = frame['score'].clip(lower=2).tolist()  # Ensure minimum size is 2 (since 1 is default karma)
+    times = pd.to_datetime(frame['created_utc'], unit='s').dt.round('us').tolist()  # Convert timestamp to datetime
+    # Truncate the title if it exceeds 60 characters
+    titles = frame['title'].where(frame['title'].str.len() <= 60, frame['title'].str[:60] + '...').tolist()
+    post_types = ['NSFW' if over_18 else 'SFW' for over_18 in frame['over_18']]
+    urls = frame['url'].tolist()  # Cache the URLs
 
     fig = px.scatter(
         x=times,
@@ -48,7 +33,7 @@ def create_user_karma_time_scatter(subreddit, users_karma, posts_data):
         size_max=50,  # Maximum bubble size
         color=karma,  # Color bubbles based on karma
         labels={'x': 'Time of Submission', 'y': 'Users', 'color': 'Karma'},  # Change legend title to "Karma"
-        title=f'Top 10 User Posts in {subreddit}',
+        title=f'Top {len(top_users)} User Posts in {subreddit}',
         height=500,
         hover_name=titles,  # Use truncated post titles for hover
         hover_data={
@@ -0,0 +1,151 @@
+import hashlib
+import heapq
+import math
+import numpy as np
+
+DEFAULT_CAPACITY = 500  # Items a Space-Saving summary keeps
+DEFAULT_WIDTH = 1024  # Count-Min counters per row: overestimate <= e / width * total
+DEFAULT_DEPTH = 4  # Count-Min rows: the bound holds with probability 1 - e^-depth
+
+
+class SpaceSaving:
+    # Weighted Space-Saving top-k summary (Metwally et al.) over non-negative weights.
+    # Each kept count overestimates the true total by at most its error, and no error
+    # exceeds total / capacity. capacity=None keeps every item and is exact.
+    # Summaries merge by adding counts, charging items missing from one side that
+    # side's floor, then keeping the largest `capacity` (Agarwal et al.).
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self.floor = 0  # Upper bound on the count of any item that is not kept
+
+    def update(self, items):
+        # items: (item, weight) pairs, already summed per item
+        batch = SpaceSaving(capacity=None)
+        for item, weight in items:
+            if weight > 0:
+                batch.counts[item] = batch.counts.get(item, 0) + weight
+                batch.total += weight
+        batch.errors = dict.fromkeys(batch.counts, 0)
+        self.merge(batch)
+
+    def merge(self, other):
+        counts, errors = {}, {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = self.counts.get(item, self.floor) + other.counts.get(item, other.floor)
+            errors[item] = self.errors.get(item, self.floor) + other.errors.get(item, other.floor)
+        self.total += other.total
+        self.floor += other.floor
+
+        if self.capacity is not None and len(counts) > self.capacity:
+            kept = heapq.nlargest(self.capacity + 1, counts.items(), key=lambda item: item[1])
+            # Everything dropped counted at most as much as the largest dropped item
+            self.floor = max(self.floor, kept.pop()[1])
+            counts = dict(kept)
+            errors = {item: errors[item] for item in counts}
+        self.counts, self.errors = counts, errors
+
+    def top(self, n):
+        # (item, count upper bound, count lower bound), largest first
+        top = heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+        return [(item, count, max(count - self.errors[item], 0)) for item, count in top]
+
+
+def _hashes(item, depth):
+    # One 64-bit hash per Count-Min row, all cut from a single digest; deterministic so
+    # tables built in different processes can be added
+    digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=8 * depth).digest()
+    return np.frombuffer(digest, dtype=np.uint64)
+
+
+class CountMinSketch:
+    # Point estimates for any item in fixed memory; never underestimates.
+    # Sketches with the same width and depth merge by adding their tables.
+    def __init__(self, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, items):
+        if not items:
+            return np.empty((0, self.depth), dtype=np.int64)
+        return (np.vstack([_hashes(item, self.depth) for item in items]) % np.uint64(self.width)).astype(np.int64)
+
+    def update(self, items):
+        # items: (item, weight) pairs with non-negative weights
+        items = [(item, weight) for item, weight in items if weight > 0]
+        columns = self._columns([item for item, _ in items])
+        weights = np.array([weight for _, weight in items], dtype=np.int64)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[:, row], weights)
+        self.total += int(weights.sum())
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Count-Min sketches of different shapes cannot be merged")
+        self.table += other.table
+        self.total += other.total
+
+    def estimate(self, items):
+        columns = self._columns(list(items))
+        return self.table[np.arange(self.depth), columns].min(axis=1)
+
+    @property
+    def error_bound(self):
+        return math.e / self.width * self.total
+
+
+class HeavyHitters:
+    # Top items by weight with bounded memory: Space-Saving picks the candidates and
+    # Count-Min tightens their upper bounds. capacity=None is exact and skips Count-Min.
+    def __init__(self, capacity=DEFAULT_CAPACITY, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.summary = SpaceSaving(capacity)
+        self.sketch = CountMinSketch(width, depth) if capacity is not None else None
+
+    @property
+    def exact(self):
+        return self.sketch is None
+
+    @property
+    def total(self):
+        return self.summary.total
+
+    @property
+    def error_bound(self):
+        # Largest possible overestimate of any reported count
+        if self.exact:
+            return 0
+        return min(self.summary.floor, self.sketch.error_bound)
+
+    def update(self, items):
+        items = list(items)
+        self.summary.update(items)
+        if self.sketch is not None:
+            self.sketch.update(items)
+
+    def merge(self, other):
+        self.summary.merge(other.summary)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        elif self.sketch is not None:
+            # Exact counts can go into the sketch as they are
+            self.sketch.update(other.summary.counts.items())
+
+    @classmethod
+    def merged(cls, sketches, capacity=DEFAULT_CAPACITY):
+        result = cls(capacity)
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+
+    def top(self, n):
+        # (item, estimate, lower bound), largest estimate first
+        top = self.summary.top(n)
+        if self.sketch is None or not top:
+            return top
+        estimates = self.sketch.estimate(item for item, _, _ in top)
+        top = [(item, min(upper, int(estimate)), lower) for (item, upper, lower), estimate in zip(top, estimates)]
+        return sorted(top, key=lambda entry: entry[1], reverse=True)
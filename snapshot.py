@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+from io import StringIO
+import pandas as pd
+from figure_cache import FigureKey
+from post_store import PostStore
+from metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process refreshes on its own
+    fcntl = None
+
+LATEST_SNAPSHOT = 'latest_snapshot'
+PINNED_KEYS = 'pinned_snapshot_keys'  # Cache keys of the latest snapshot, unpinned by the next one
+BLOB = 'blob'  # FigureKey.snapshot of content-addressed posts and comments
+
+
+class Snapshot:
+    # Immutable view of one refresh. The per-subreddit figures live in the shared figure
+    # cache under this snapshot's version. Posts and comments are stored by content and
+    # found through the version's manifest, so snapshots with unchanged data share them.
+    __slots__ = ('version', 'created_at', 'stats_df', 'main_figure', 'figure_cache', '_posts', '_text_indexes',
+                 '_comment_indexes', '_manifest')
+
+    def __init__(self, version, stats_df, main_figure, figure_cache, posts=None, text_indexes=None,
+                 comment_indexes=None, created_at=None):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'created_at', created_at or datetime.now())
+        object.__setattr__(self, 'stats_df', stats_df)
+        object.__setattr__(self, 'main_figure', main_figure)
+        object.__setattr__(self, 'figure_cache', figure_cache)
+        object.__setattr__(self, '_posts', dict(posts or {}))
+        object.__setattr__(self, '_text_indexes', dict(text_indexes or {}))
+        object.__setattr__(self, '_comment_indexes', dict(comment_indexes or {}))
+        object.__setattr__(self, '_manifest', {})  # kind -> subreddit -> content digest
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable")
+
+    def get_figure(self, subreddit, kind):
+        return self.figure_cache.get(FigureKey(self.version, subreddit, kind))
+
+    def _get_blob(self, subreddit, kind):
+        if not self._manifest:
+            manifest_json = self.figure_cache.get_json(FigureKey(self.version, '', 'manifest'))
+            if manifest_json is None:
+                return None
+            self._manifest.update(json.loads(manifest_json))
+        digest = self._manifest.get(kind, {}).get(subreddit)
+        if digest is None:
+            return None
+        return self.figure_cache.get_json(FigureKey(BLOB, digest, kind))
+
+    def get_posts(self, subreddit):
+        # Processes that did not build this snapshot load the posts from the cache once
+        posts = self._posts.get(subreddit)
+        if posts is None:
+            posts_json = self._get_blob(subreddit, 'posts')
+            if posts_json is None:
+                return None
+            posts = self._posts[subreddit] = PostStore.from_json(posts_json)
+        return posts
+
+    def get_text_index(self, subreddit, build):
+        # Built at ingest time by the refreshing process, on first use everywhere else
+        text_index = self._text_indexes.get(subreddit)
+        if text_index is None:
+            posts = self.get_posts(subreddit)
+            if posts is None:
+                return None
+            text_index = self._text_indexes[subreddit] = build(posts)
+        return text_index
+
+    def get_comment_index(self, subreddit):
+        # Tokens of the sampled comments; None when comments were not ingested
+        comment_index = self._comment_indexes.get(subreddit)
+        if comment_index is None:
+            comments_json = self._get_blob(subreddit, 'comments')
+            if comments_json is None:
+                return None
+            from text_index import TextIndex
+            comment_index = self._comment_indexes[subreddit] = TextIndex.from_json(comments_json)
+        return comment_index
+
+    def save(self):
+        # Posts, comments, main figure and stats first, then publish the version for other
+        # processes. They are pinned until the next snapshot is published, so a restart
+        # after any downtime can still serve them; figures are rebuilt from the posts when
+        # missing. Posts and comments already stored by an earlier snapshot are not rewritten.
+        pinned = []
+        manifest = {'posts': {}, 'comments': {}}
+        for kind, items in (('posts', self._posts), ('comments', self._comment_indexes)):
+            for subreddit, item in items.items():
+                key = FigureKey(BLOB, item.digest(), kind)
+                if self.figure_cache.pin(key):
+                    metrics.increment('snapshot_blob', result='reuse', kind=kind)
+                else:
+                    metrics.increment('snapshot_blob', result='write', kind=kind)
+                    self.figure_cache.put_json(key, item.to_json(), pinned=True)
+                manifest[kind][subreddit] = key.subreddit
+                pinned.append(key)
+        self._manifest.update(manifest)
+
+        values = {
+            FigureKey(self.version, '', 'manifest'): json.dumps(manifest),
+            FigureKey(self.version, '', 'main'): self.main_figure.to_json(),
+            FigureKey(self.version, '', 'stats'): self.stats_df.to_json(orient='split'),
+        }
+        for key, value in values.items():
+            self.figure_cache.put_json(key, value, pinned=True)
+        pinned.extend(values)
+
+        previous = self.figure_cache.get_meta(PINNED_KEYS)
+        self.figure_cache.set_meta(LATEST_SNAPSHOT, str(self.version))
+        self.figure_cache.set_meta(PINNED_KEYS, json.dumps(pinned))
+        if previous is not None:
+            current = set(pinned)
+            self.figure_cache.unpin([FigureKey(*key) for key in json.loads(previous) if FigureKey(*key) not in current])
+
+    @classmethod
+    def load(cls, figure_cache, version):
+        main_figure = figure_cache.get(FigureKey(version, '', 'main'))
+        stats_json = figure_cache.get_json(FigureKey(version, '', 'stats'))
+        if main_figure is None or stats_json is None:
+            return None
+        stats_df = pd.read_json(StringIO(stats_json), orient='split')
+        return cls(version, stats_df, main_figure, figure_cache)
+
+
+class SnapshotScheduler:
+    # Rebuilds the snapshot on a background thread and swaps it in atomically.
+    # With a lock file only one process refreshes; the others serve what it publishes.
+    def __init__(self, build_snapshot, interval, figure_cache, lock_path=None, trace_dir=None, on_publish=None):
+        self.build_snapshot = build_snapshot
+        self.on_publish = on_publish  # Called with each snapshot right after it is swapped in
+        self.trace_dir = trace_dir  # Write a JSON trace of every refresh here when set
+        self.interval = interval
+        self.figure_cache = figure_cache
+        self.lock_path = lock_path
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def current(self):
+        if self._lock_file is None and self.lock_path is not None:
+            self._follow()
+        return self._snapshot
+
+    def _follow(self):
+        latest = self.figure_cache.get_meta(LATEST_SNAPSHOT)
+        if latest is None or (self._snapshot is not None and self._snapshot.version == int(latest)):
+            return
+        snapshot = Snapshot.load(self.figure_cache, int(latest))
+        if snapshot is not None:
+            with self._lock:
+                self._snapshot = snapshot
+
+    def _try_lead(self):
+        if self.lock_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def refresh(self):
+        # Versions keep increasing across restarts so cache keys never collide
+        self._version = max(self._version + 1, int(time.time()))
+        started = time.time()
+        print(f"Building snapshot {self._version}...")
+        if self.trace_dir is not None:
+            metrics.start_trace()
+        try:
+            with metrics.timer('refresh'):
+                snapshot = self.build_snapshot(self._version)
+                with metrics.timer('snapshot_save'):
+                    snapshot.save()
+        finally:
+            if self.trace_dir is not None:
+                metrics.write_trace(os.path.join(self.trace_dir, f'refresh_{self._version}.json'),
+                                    version=self._version, started=started)
+        with self._lock:
+            self._snapshot = snapshot
+        print(f"Snapshot {self._version} ready in {time.time() - started:.1f}s")
+        if self.on_publish is not None:
+            self.on_publish(snapshot)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._try_lead():
+                try:
+                    self.refresh()
+                except Exception:
+                    # Keep serving the previous snapshot if a refresh fails
+                    print("Snapshot refresh failed, keeping previous snapshot")
+                    traceback.print_exc()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self._snapshot is None:
+            # Serve what the last run published while the first refresh crawls
+            self._follow()
+            if self._snapshot is not None:
+                print(f"Serving persisted snapshot {self._snapshot.version} until the refresh finishes")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='snapshot-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,149 @@
+import threading
+import time
+import traceback
+from collections import Counter
+from incremental import SubredditState, WINDOW_SECONDS
+from post_store import PostStore, record_from_dict
+from metrics import metrics
+
+BUCKET_SECONDS = 5 * 60  # Granularity of the rolling window
+RESCORE_INTERVAL_SECONDS = 10 * 60  # How often streamed posts get fresh scores
+STREAM_RESCORE_MAX_AGE_SECONDS = 3 * 60 * 60  # Only posts this young are re-scored
+STREAM_RETRY_SECONDS = 30  # Wait before reopening a stream that failed or ended
+
+
+class RollingWindow:
+    # One subreddit's posts in the last `window` seconds, counted per time bucket. Finding
+    # what expired only looks at the bucket starts; the posts are compacted once per
+    # expired bucket rather than on every refresh.
+    def __init__(self, posts, subscribers, window=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS):
+        self.posts = PostStore()
+        self.subscribers = subscribers
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.buckets = Counter()  # bucket start -> posts in the bucket
+        for record in posts:
+            self.add(record)
+
+    def add(self, record):
+        if record.id in self.posts:
+            return
+        self.posts.append(record)
+        self.buckets[record.created_utc // self.bucket_seconds * self.bucket_seconds] += 1
+
+    def rescore(self, record):
+        if record.id in self.posts:
+            self.posts.update(record)
+
+    def evict(self, now):
+        # Whole buckets only: the window is at most one bucket longer than `window`
+        cutoff = (now - self.window) // self.bucket_seconds * self.bucket_seconds
+        expired = [start for start in self.buckets if start < cutoff]
+        for start in expired:
+            del self.buckets[start]
+        if expired:
+            self.posts.remove_older_than(cutoff)
+
+    def recent_ids(self, since_utc):
+        return [post_id for post_id, created in zip(self.posts.ids, self.posts.created_utc) if created >= since_utc]
+
+    def frozen(self):
+        # Copy for a snapshot; the stream keeps updating this window
+        return SubredditState(self.posts.copy(), self.subscribers)
+
+
+class StreamIngestor:
+    # Follows new submissions as they are posted instead of re-crawling. Each subreddit is
+    # seeded once with a top-of-day crawl, then kept current by a background stream thread
+    # that also re-scores young posts every `rescore_interval` seconds. refresh() has the
+    # same contract as IncrementalIngestor.refresh and never waits on the network for
+    # subreddits that are already tracked.
+    def __init__(self, fetcher, window=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS,
+                 rescore_interval=RESCORE_INTERVAL_SECONDS, rescore_max_age=STREAM_RESCORE_MAX_AGE_SECONDS,
+                 stream_all=False):
+        self.fetcher = fetcher
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.rescore_interval = rescore_interval
+        self.rescore_max_age = rescore_max_age
+        self.stream_all = stream_all  # Follow r/all and keep the tracked subreddits' posts
+        self.states = {}
+        self._lock = threading.Lock()
+        self._streamed = None
+        self._stop = None
+
+    def reset(self):
+        self.stop()
+        with self._lock:
+            self.states = {}
+        self._streamed = None
+
+    def refresh(self, subreddits):
+        now = time.time()
+        new_subreddits = [subreddit for subreddit in subreddits if subreddit not in self.states]
+        seeded = self.fetcher.fetch_subreddits(new_subreddits)
+
+        with self._lock:
+            # Dropped subreddits take their rolling windows with them; new ones start from the full fetch above
+            self.states = {subreddit: state for subreddit, state in self.states.items() if subreddit in subreddits}
+            for subreddit, posts, subscribers in seeded:
+                self.states[subreddit] = RollingWindow(posts, subscribers, self.window, self.bucket_seconds)
+            for state in self.states.values():
+                state.evict(now)
+            frozen = {subreddit: self.states[subreddit].frozen() for subreddit in subreddits}
+
+        if set(subreddits) != self._streamed:
+            self._start_stream(set(subreddits))
+        return frozen
+
+    def _start_stream(self, subreddits):
+        self.stop()
+        self._streamed = subreddits
+        self._stop = stop = threading.Event()
+        thread = threading.Thread(target=self._run, args=(sorted(subreddits), stop), name='reddit-stream', daemon=True)
+        thread.start()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    def _run(self, subreddits, stop):
+        last_rescore = time.monotonic()
+        while not stop.is_set():
+            try:
+                for post in self.fetcher.stream(None if self.stream_all else subreddits):
+                    if stop.is_set():
+                        return
+                    if post is not None:
+                        self._add(post)
+                    if time.monotonic() - last_rescore >= self.rescore_interval:
+                        self._rescore(subreddits)
+                        last_rescore = time.monotonic()
+            except Exception:
+                print("Reddit stream failed, reconnecting")
+                traceback.print_exc()
+            stop.wait(STREAM_RETRY_SECONDS)
+
+    def _add(self, post):
+        record = record_from_dict(post)
+        if record.created_utc < time.time() - self.window:
+            return
+        with self._lock:
+            state = self.states.get(post['subreddit'])
+            if state is None:
+                return
+            state.add(record)
+            if post.get('subreddit_subscribers') is not None:
+                state.subscribers = post['subreddit_subscribers']
+
+    @metrics.timed('stream_rescore')
+    def _rescore(self, subreddits):
+        since = time.time() - self.rescore_max_age
+        for subreddit in subreddits:
+            with self._lock:
+                state = self.states.get(subreddit)
+                recent = state.recent_ids(since) if state is not None else []
+            records = self.fetcher.fetch_info(recent)
+            with self._lock:
+                for record in records:
+                    state.rescore(record)
@@ -0,0 +1,57 @@
+from collections import Counter
+import numpy as np
+from sketches import HeavyHitters, SpaceSaving
+
+NUM_EVENTS = 400000
+CAPACITY = 200
+PARTS = 8
+
+
+def zipf_counts(seed=0):
+    # Item -> count over NUM_EVENTS Zipf-distributed events, split into PARTS streams
+    events = np.random.default_rng(seed).zipf(1.3, NUM_EVENTS)
+    return [Counter(part.tolist()) for part in np.array_split(events, PARTS)]
+
+
+def test_space_saving_merge_bounds():
+    parts = zipf_counts()
+    exact = sum(parts, Counter())
+    merged = SpaceSaving(CAPACITY)
+    for counts in parts:
+        summary = SpaceSaving(CAPACITY)
+        summary.update(counts.items())
+        merged.merge(summary)
+
+    assert merged.total == NUM_EVENTS
+    assert len(merged.counts) <= CAPACITY
+    for item, upper, lower in merged.top(CAPACITY):
+        assert lower <= exact[item] <= upper
+        assert upper - exact[item] <= NUM_EVENTS / CAPACITY
+    # Anything heavier than the floor is guaranteed to be kept
+    assert all(item in merged.counts for item, count in exact.items() if count > merged.floor)
+
+
+def test_heavy_hitters_top_bounds():
+    parts = zipf_counts(seed=1)
+    exact = sum(parts, Counter())
+    sketches = []
+    for counts in parts:
+        sketch = HeavyHitters(CAPACITY)
+        sketch.update(counts.items())
+        sketches.append(sketch)
+    merged = HeavyHitters.merged(sketches, CAPACITY)
+
+    top = merged.top(20)
+    assert [estimate for _, estimate, _ in top] == sorted((estimate for _, estimate, _ in top), reverse=True)
+    for item, estimate, lower in top:
+        assert lower <= exact[item] <= estimate
+        assert estimate - exact[item] <= merged.error_bound
+    assert {item for item, _, _ in top[:10]} == {item for item, _ in exact.most_common(10)}
+
+
+def test_exact_heavy_hitters():
+    counts = zipf_counts()[0]
+    sketch = HeavyHitters(capacity=None)
+    sketch.update(counts.items())
+    assert sketch.error_bound == 0
+    assert [(item, count) for item, count, _ in sketch.top(10)] == counts.most_common(10)
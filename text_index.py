@@ -0,0 +1,125 @@
+import hashlib
+import json
+import re
+import numpy as np
+from scipy import sparse
+from metrics import metrics
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)*")  # Apostrophes stay inside words: "don't", not "don" and "t"
+
+def tokenize(text, stop_words):
+    # Possessives count as their word ("reddit's" is "reddit"); other contractions
+    # ("don't", "i've", "isn't") are function words and are dropped with the stopwords
+    words = []
+    for word in TOKEN_PATTERN.findall(text.lower().replace('\u2019', "'")):
+        if word.endswith("'s"):
+            word = word[:-2]
+        if len(word) > 1 and "'" not in word and word not in stop_words:
+            words.append(word)
+    return words
+
+
+class TextIndexBuilder:
+    # Tokenizes documents one at a time as they arrive; only term ids are kept, never the text
+    def __init__(self, stop_words):
+        self.stop_words = stop_words
+        self.vocabulary = {}
+        self.tokens = []
+        self.doc_lengths = []
+
+    def add(self, text):
+        words = tokenize(text, self.stop_words)
+        self.tokens.extend(self.vocabulary.setdefault(word, len(self.vocabulary)) for word in words)
+        self.doc_lengths.append(len(words))
+
+    def build(self):
+        return TextIndex.from_tokens(self.vocabulary, self.tokens, self.doc_lengths)
+
+
+class TextIndex:
+    # Titles tokenized once into integer term ids over a shared vocabulary. Token ids are
+    # kept in document order (tokens/doc_of) for windowed co-occurrence, alongside term
+    # frequencies and a sparse document-term count matrix.
+    def __init__(self, documents, stop_words):
+        builder = TextIndexBuilder(stop_words)
+        for text in documents:
+            builder.add(text)
+        self._index(builder.vocabulary, builder.tokens, builder.doc_lengths)
+
+    @classmethod
+    def from_tokens(cls, vocabulary, tokens, doc_lengths):
+        index = cls.__new__(cls)
+        index._index(vocabulary, tokens, doc_lengths)
+        return index
+
+    def _index(self, vocabulary, tokens, doc_lengths):
+        self.vocabulary = vocabulary
+        self.terms = np.array(list(vocabulary), dtype=object)
+        self.tokens = np.array(tokens, dtype=np.int32)
+        self.doc_of = np.repeat(np.arange(len(doc_lengths)), doc_lengths)
+        self.term_frequencies = np.bincount(self.tokens, minlength=len(self.terms))
+        self.doc_term = sparse.csr_matrix(
+            (np.ones(len(self.tokens)), (self.doc_of, self.tokens)),
+            shape=(len(doc_lengths), len(self.terms)))
+
+    def __getstate__(self):
+        # Pickled as the token stream, which is much smaller than the derived arrays
+        doc_lengths = np.bincount(self.doc_of, minlength=self.num_docs)
+        return self.terms.tolist(), self.tokens, doc_lengths
+
+    def __setstate__(self, state):
+        terms, tokens, doc_lengths = state
+        self._index({term: term_id for term_id, term in enumerate(terms)}, tokens, doc_lengths)
+
+    def to_json(self):
+        doc_lengths = np.bincount(self.doc_of, minlength=self.num_docs)
+        return json.dumps({'terms': self.terms.tolist(), 'tokens': self.tokens.tolist(),
+                           'doc_lengths': doc_lengths.tolist()})
+
+    @classmethod
+    def from_json(cls, value):
+        data = json.loads(value)
+        vocabulary = {term: term_id for term_id, term in enumerate(data['terms'])}
+        return cls.from_tokens(vocabulary, data['tokens'], data['doc_lengths'])
+
+    def digest(self):
+        digest = hashlib.blake2b('\0'.join(self.terms.tolist()).encode('utf-8'), digest_size=16)
+        digest.update(self.tokens.tobytes())
+        digest.update(self.doc_of.tobytes())
+        return digest.hexdigest()
+
+    @property
+    def num_docs(self):
+        return self.doc_term.shape[0]
+
+    @property
+    def num_terms(self):
+        return len(self.terms)
+
+    def top_terms(self, n):
+        # (term, count) pairs, most frequent first
+        order = np.argsort(-self.term_frequencies, kind='stable')[:n]
+        return [(self.terms[i], int(self.term_frequencies[i])) for i in order]
+
+
+class TextIndexCache:
+    # Keeps each subreddit's index across refreshes and rebuilds it only when the
+    # subreddit's posts changed, so quiet subreddits are not re-tokenized every snapshot
+    def __init__(self, build):
+        self.build = build  # build(posts) -> TextIndex
+        self._entries = {}  # subreddit -> (ids digest, TextIndex)
+
+    def update(self, posts_by_subreddit):
+        # subreddit -> TextIndex for exactly these subreddits; the others are forgotten
+        entries = {}
+        for subreddit, posts in posts_by_subreddit.items():
+            key = posts.ids_digest()
+            entry = self._entries.get(subreddit)
+            if entry is not None and entry[0] == key:
+                metrics.increment('text_index_cache', result='reuse')
+            else:
+                metrics.increment('text_index_cache', result='build')
+                entry = key, self.build(posts)
+            entries[subreddit] = entry
+        self._entries = entries
+        return {subreddit: text_index for subreddit, (_, text_index) in entries.items()}
@@ -1,22 +1,9 @@
 
 import plotly.graph_objects as go
-from collections import Counter
 
-def create_top_words_graph(subreddit, top_titles, custom_stop_words):
-    titles = [submission.title for submission in top_titles]
-    words = ' '.join(titles).lower().split()
-
-    # Filter out stopwords and non-alphabetic words
-    filtered_words = [
-        word for word in words
-        if word not in custom_stop_words and word.isalpha()
-    ]
-    
-    # Count remaining words
-    word_counts = Counter(filtered_words)
-    
+def create_top_words_graph(subreddit, text_index, label='Words'):
     # Get the top 10 most common words (or however many are available)
-    top_words = word_counts.most_common(10)
+    top_words = text_index.top_terms(10)
     
     # Handle the case where there are no top words
     if not top_words:
@@ -39,7 +26,7 @@ def create_top_words_graph(subreddit, top_titles, custom_stop_words):
             marker=dict(color='rgba(50, 171, 96, 0.6)', line=dict(color='rgba(50, 171, 96, 1.0)', width=1)),
         )],
         layout=go.Layout(
-            title=f'Top {len(words)} Words for {subreddit}',
+            title=f'Top {len(words)} {label} for {subreddit}',
             xaxis=dict(title='Frequency'),
             yaxis=dict(title='Words'),
             margin=dict(l=120, r=20, t=70, b=70),
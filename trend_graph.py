@@ -0,0 +1,46 @@
+import plotly.graph_objects as go
+
+def create_trend_graph(subreddit, history_df, days):
+    if history_df.empty:
+        print(f"No history found for subreddit: {subreddit}")
+        return go.Figure()
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=history_df['time'],
+        y=history_df['karma'],
+        name='Karma',
+        mode='lines+markers',
+        line=dict(color='blue'),
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=history_df['time'],
+        y=history_df['comments'],
+        name='Comments',
+        mode='lines+markers',
+        line=dict(color='rgba(50, 171, 96, 1.0)'),
+        yaxis='y2',
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=history_df['time'],
+        y=history_df['posts'],
+        name='Posts',
+        mode='lines+markers',
+        line=dict(color='rgba(255, 100, 100, 1.0)'),
+        yaxis='y2',
+    ))
+
+    fig.update_layout(
+        title=f'{subreddit} over the Last {days} Days',
+        xaxis=dict(title='Snapshot Time'),
+        yaxis=dict(title='Karma in Last 24 Hours'),
+        yaxis2=dict(title='Posts / Comments in Last 24 Hours', overlaying='y', side='right'),
+        legend=dict(orientation='h', y=-0.2),
+        margin=dict(l=80, r=80, t=70, b=70),
+        height=400,
+    )
+
+    return fig
@@ -1,8 +1,10 @@
 
 import plotly.graph_objects as go
 
-def create_user_karma_graph(subreddit, users_karma):
-    top_users = users_karma[subreddit].most_common(10)
+TOP_USERS = 10
+
+def create_user_karma_graph(subreddit, posts, top_n=TOP_USERS):
+    top_users = posts.top_authors(top_n)
     
     if not top_users:
         print(f"No significant users found for subreddit: {subreddit}")